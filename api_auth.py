@@ -0,0 +1,60 @@
+"""
+JWT authentication shared by the Rosec Flask APIs
+This module handles:
+- Verifying the bearer tokens issued by the auth API (real_auth_api.py)
+- The require_auth decorator for protected routes
+- Counting token checks by outcome for /metrics
+"""
+
+import os
+from functools import wraps
+
+import jwt
+from flask import request, jsonify
+
+import prometheus_metrics
+
+JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
+
+# Register with each app's registry: prometheus.register(api_auth.token_verifications)
+token_verifications = prometheus_metrics.Counter('rosec_token_verifications_total',
+                                                 'API token checks by outcome', ('outcome',))
+
+# Authentication decorator
+def require_auth(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = request.headers.get('Authorization')
+
+        if not token:
+            token_verifications.inc(outcome='missing')
+            return jsonify({
+                'success': False,
+                'error': 'Authentication required'
+            }), 401
+
+        # Remove 'Bearer ' prefix if present
+        if token.startswith('Bearer '):
+            token = token[7:]
+
+        try:
+            # Verify token
+            decoded = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            token_verifications.inc(outcome='expired')
+            return jsonify({
+                'success': False,
+                'error': 'Token expired'
+            }), 401
+        except jwt.InvalidTokenError:
+            token_verifications.inc(outcome='invalid')
+            return jsonify({
+                'success': False,
+                'error': 'Invalid token'
+            }), 401
+
+        token_verifications.inc(outcome='valid')
+        request.user = decoded
+        return f(*args, **kwargs)
+
+    return decorated_function
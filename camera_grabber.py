@@ -0,0 +1,103 @@
+"""
+Background camera capture for the Rosec scanner
+This module handles:
+- Draining the camera continuously on a dedicated thread
+- Keeping the newest frames in a small ring buffer of timestamped frames
+- Handing the freshest frame to requests without blocking on the camera
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SIZE = 4
+DEFAULT_MAX_FRAME_AGE = 0.5     # Seconds before a buffered frame counts as stale
+
+class CameraGrabber:
+    """Reads a cv2.VideoCapture on its own thread into a ring buffer.
+
+    Frames handed out are shared between readers and must not be modified
+    in place.
+    """
+
+    def __init__(self, capture, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.capture = capture
+        self.frames_read = 0
+        self.read_failures = 0
+        self._frames = deque(maxlen=buffer_size)
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start the capture thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='camera-grabber', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the capture thread and wait for it to exit"""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        with self._condition:
+            self._condition.notify_all()
+
+    def _run(self):
+        while self._running:
+            try:
+                ret, frame = self.capture.read()
+            except Exception as e:
+                logger.error(f"Camera read error: {e}")
+                ret, frame = False, None
+
+            if not ret:
+                self.read_failures += 1
+                time.sleep(0.05)
+                continue
+
+            with self._condition:
+                self.frames_read += 1
+                self._frames.append((time.monotonic(), self.frames_read, frame))
+                self._condition.notify_all()
+
+    def latest(self):
+        """Newest buffered (timestamp, sequence, frame), or None if nothing was captured yet"""
+        with self._condition:
+            return self._frames[-1] if self._frames else None
+
+    def wait_for_frame(self, newer_than=0, timeout=1.0):
+        """Block until a frame with a sequence number above `newer_than` arrives.
+
+        Returns (timestamp, sequence, frame), or None on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not self._frames or self._frames[-1][1] <= newer_than:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    return None
+                self._condition.wait(remaining)
+            return self._frames[-1]
+
+    def fresh_frame(self, max_age=DEFAULT_MAX_FRAME_AGE, timeout=1.0):
+        """The newest frame, waiting for a new one only if the buffer is stale or empty"""
+        entry = self.latest()
+        if entry is not None and time.monotonic() - entry[0] <= max_age:
+            return entry[2]
+        entry = self.wait_for_frame(entry[1] if entry else 0, timeout)
+        return entry[2] if entry else None
+
+    def fps(self):
+        """Capture rate measured over the buffered frames"""
+        with self._condition:
+            if len(self._frames) < 2:
+                return 0.0
+            elapsed = self._frames[-1][0] - self._frames[0][0]
+            return round((len(self._frames) - 1) / elapsed, 1) if elapsed > 0 else 0.0
@@ -0,0 +1,121 @@
+"""
+Hands-free continuous scanning for the Rosec scanner
+This module handles:
+- Watching low-resolution camera frames for a sheet entering the view
+- Waiting until the sheet has been still for a few frames
+- Triggering one full-resolution scan per sheet
+"""
+
+import logging
+import threading
+import time
+
+import cv2
+
+import sheet_alignment
+
+logger = logging.getLogger(__name__)
+
+WATCH_WIDTH = 160           # Width of the frames compared for motion
+WATCH_FPS = 10              # Frames per second the watcher looks at
+STILL_THRESHOLD = 2.0       # Mean gray-level change below which a frame counts as still
+MOVE_THRESHOLD = 8.0        # Mean gray-level change that counts as something moving in view
+STABLE_FRAMES = 4           # Consecutive still frames required before scanning
+
+class SheetWatcher:
+    """Triggers `on_sheet(frame)` once for every sheet that is placed and held still.
+
+    After a scan the watcher stays disarmed until it sees motion (the sheet
+    being taken away, the next sheet or the operator's hand), so one sheet is
+    never scanned twice.
+    """
+
+    def __init__(self, grabber, on_sheet):
+        self.grabber = grabber
+        self.on_sheet = on_sheet
+        self.sheets_scanned = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start watching on a background thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='sheet-watcher', daemon=True)
+        self._thread.start()
+        logger.info("Continuous scanning started")
+
+    def stop(self):
+        """Stop watching"""
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+        logger.info("Continuous scanning stopped")
+
+    @property
+    def active(self):
+        return self._running
+
+    def _run(self):
+        grabber = None
+        previous = None
+        sequence = 0
+        still_frames = 0
+        armed = True
+        interval = 1.0 / WATCH_FPS
+
+        while self._running:
+            if self.grabber is not grabber:
+                # A re-initialized camera numbers its frames from 1 again and shows a new view
+                grabber, sequence, previous, still_frames = self.grabber, 0, None, 0
+            # A stopped grabber (e.g. the camera failed to reopen) returns at once, so wait here instead
+            entry = grabber.wait_for_frame(sequence, timeout=1.0) if grabber is not None else None
+            if entry is None:
+                time.sleep(interval)
+                continue
+            started = time.monotonic()
+            _, sequence, frame = entry
+
+            small = watch_frame(frame)
+            motion = float(cv2.absdiff(small, previous).mean()) if previous is not None else MOVE_THRESHOLD
+            previous = small
+
+            if motion >= MOVE_THRESHOLD:
+                armed = True
+            still_frames = still_frames + 1 if motion < STILL_THRESHOLD else 0
+
+            if armed and still_frames >= STABLE_FRAMES:
+                # Only look for the sheet's markers once the view has settled
+                if self._sheet_in_view(frame) and self._scan(frame):
+                    armed = False
+                still_frames = 0
+
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    def _sheet_in_view(self, frame):
+        """Whether the sheet's markers are in the frame; a frame that cannot be checked is skipped"""
+        try:
+            return sheet_alignment.locate_sheet(frame) is not None
+        except Exception as e:
+            logger.error(f"Continuous scan sheet check error: {e}")
+            return False
+
+    def _scan(self, frame):
+        """Hand the frame to `on_sheet`; returning False from it keeps the watcher armed"""
+        try:
+            if self.on_sheet(frame) is False:
+                return False
+            self.sheets_scanned += 1
+        except Exception as e:
+            logger.error(f"Continuous scan error: {e}")
+        return True
+
+def watch_frame(frame):
+    """Small grayscale copy of a frame for motion checks"""
+    scale = WATCH_WIDTH / frame.shape[1]
+    small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return small
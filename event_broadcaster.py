@@ -0,0 +1,99 @@
+"""
+Server-Sent Events broadcasting for the Rosec scanner
+This module handles:
+- Serializing each event once and fanning it out to every subscribed client
+- Replaying missed events to clients that reconnect with Last-Event-ID
+- Dropping clients that stop reading instead of buffering for them without limit
+"""
+
+import json
+import logging
+import queue
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SIZE = 200          # Recent events kept for reconnecting clients
+SUBSCRIBER_QUEUE_SIZE = 100 # Events a client may fall behind before it is dropped
+KEEPALIVE_INTERVAL = 15.0   # Seconds of silence before a keep-alive comment is sent
+
+class EventBroadcaster:
+    """One producer, many SSE subscribers.
+
+    `publish` never blocks: a subscriber whose queue is full is disconnected
+    and catches up from the history when its EventSource reconnects.
+    """
+
+    def __init__(self, history_size=HISTORY_SIZE, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.published = 0
+        self.dropped = 0
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def publish(self, event, data):
+        """Send an event to every subscriber"""
+        with self._lock:
+            self.published += 1
+            message = f"id: {self.published}\nevent: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+            self._history.append((self.published, message))
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber):
+        with self._lock:
+            if subscriber not in self._subscribers:
+                return
+            self._subscribers.discard(subscriber)
+            self.dropped += 1
+        logger.warning("Dropping an event stream client that stopped reading")
+        # Make room for the end-of-stream marker so the client's stream closes
+        try:
+            while True:
+                subscriber.get_nowait()
+        except queue.Empty:
+            pass
+        subscriber.put_nowait(None)
+
+    def subscribe(self, last_event_id=None):
+        """Register a subscriber queue, pre-filled with the events after `last_event_id`"""
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if last_event_id is not None:
+                for event_id, message in list(self._history)[-self.queue_size:]:
+                    if event_id > last_event_id:
+                        subscriber.put_nowait(message)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def subscribers(self):
+        return len(self._subscribers)
+
+    def stream(self, subscriber, first=(), keepalive=KEEPALIVE_INTERVAL):
+        """SSE text for one subscriber: the `first` (event, data) pairs, then broadcast events"""
+        try:
+            for event, data in first:
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+            while True:
+                try:
+                    message = subscriber.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
@@ -0,0 +1,52 @@
+"""
+Lazily initialized Firebase Admin clients for the Rosec Flask APIs
+This module handles:
+- Importing firebase_admin and loading the service account key on first use, not at import
+- Initializing the Firebase app exactly once, even when requests race for it
+- Handing out the shared Firestore client and the auth module
+"""
+
+import os
+import threading
+
+# Service account key used when Firebase is first needed
+SERVICE_ACCOUNT_KEY = os.environ.get('FIREBASE_SERVICE_ACCOUNT_KEY', 'serviceAccountKey.json.json')
+
+_app = None
+_firestore = None
+_lock = threading.Lock()
+
+def get_app(key_path=None):
+    """The Firebase Admin app, initialized on first call.
+
+    The app is initialized from `key_path`, or SERVICE_ACCOUNT_KEY when not
+    given; once it exists, later calls share it whatever key they pass.
+    """
+    global _app
+    if _app is None:
+        with _lock:
+            if _app is None:
+                import firebase_admin
+                from firebase_admin import credentials
+                try:
+                    _app = firebase_admin.get_app()
+                except ValueError:
+                    _app = firebase_admin.initialize_app(credentials.Certificate(key_path or SERVICE_ACCOUNT_KEY))
+    return _app
+
+def firestore_client(key_path=None):
+    """The shared Firestore client, initializing the app from `key_path` if needed"""
+    global _firestore
+    if _firestore is None:
+        app = get_app(key_path)
+        with _lock:
+            if _firestore is None:
+                from firebase_admin import firestore
+                _firestore = firestore.client(app)
+    return _firestore
+
+def auth():
+    """firebase_admin.auth, with the app initialized"""
+    get_app()
+    from firebase_admin import auth as firebase_auth
+    return firebase_auth
@@ -0,0 +1,75 @@
+"""
+Frame quality gate for the Rosec scanner
+This module handles:
+- Measuring sharpness, overexposure and sheet coverage on a downscaled frame
+- Rejecting frames that are not worth running the OMR pipeline on
+"""
+
+import cv2
+import numpy as np
+
+CHECK_WIDTH = 640           # Frames are checked at this width
+
+MIN_SHARPNESS = 150.0       # Variance of the Laplacian on the sheet below which the frame is blurry
+MAX_OVEREXPOSURE = 0.08     # Share of the sheet allowed to be saturated
+MIN_COVERAGE = 0.2          # Share of the frame the sheet must cover
+MIN_PAPER_LEVEL = 110       # Gray level below which nothing counts as paper
+SATURATED_LEVEL = 250
+
+def check_frame(image, small=None):
+    """Cheap quality check of a frame before the full pipeline.
+
+    `small` is a grayscale copy already downscaled to CHECK_WIDTH, such as the
+    one sheet_alignment.downscale() makes for locating the sheet; it is made
+    here when not given.
+
+    Returns a dict with 'ok', the rejection 'reason' ('no_sheet', 'blurry',
+    'overexposed' or None) and the measured 'sharpness', 'overexposure' and
+    'coverage'.
+    """
+    if small is None:
+        scale = min(1.0, CHECK_WIDTH / image.shape[1])
+        small = image
+        if scale < 1.0:
+            small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    # The sheet is the largest bright blob
+    level, _ = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    _, paper = cv2.threshold(small, max(level, MIN_PAPER_LEVEL), 255, cv2.THRESH_BINARY)
+    contours, _ = cv2.findContours(paper, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    sheet = max(contours, key=cv2.contourArea, default=None)
+    if sheet is None:
+        return _verdict('no_sheet', 0.0, 0.0, 0.0)
+    coverage = cv2.contourArea(sheet) / float(small.shape[0] * small.shape[1])
+
+    # Sharpness and overexposure are measured on the sheet only, away from its border
+    mask = np.zeros_like(small)
+    cv2.drawContours(mask, [sheet], -1, 255, cv2.FILLED)
+    mask = cv2.erode(mask, np.ones((9, 9), np.uint8))
+    inside = mask > 0
+    if not inside.any():
+        return _verdict('no_sheet', 0.0, 0.0, coverage)
+
+    sharpness = float(cv2.Laplacian(small, cv2.CV_32F)[inside].var())
+    overexposure = float(np.count_nonzero(small[inside] >= SATURATED_LEVEL)) / np.count_nonzero(inside)
+
+    if coverage < MIN_COVERAGE:
+        reason = 'no_sheet'
+    elif sharpness < MIN_SHARPNESS:
+        reason = 'blurry'
+    elif overexposure > MAX_OVEREXPOSURE:
+        reason = 'overexposed'
+    else:
+        reason = None
+    return _verdict(reason, sharpness, overexposure, coverage)
+
+def _verdict(reason, sharpness, overexposure, coverage):
+    return {
+        'ok': reason is None,
+        'reason': reason,
+        'sharpness': round(float(sharpness), 1),
+        'overexposure': round(float(overexposure), 3),
+        'coverage': round(float(coverage), 3)
+    }
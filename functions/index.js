@@ -8,6 +8,10 @@
  */
 
 const functions = require("firebase-functions");
+const admin = require("firebase-admin");
+const Busboy = require("@fastify/busboy");
+
+admin.initializeApp();
 
 // Accept multiple students
 exports.api = functions.https.onRequest((req, res) => {
@@ -26,6 +30,214 @@ exports.api = functions.https.onRequest((req, res) => {
   return res.status(405).send("Only POST allowed");
 });
 
+/**
+ * Read a Raspberry Pi request: a JSON body {action, data}, or multipart form
+ * data with 'action' and JSON-encoded 'data' fields plus JPEG file parts.
+ * @param {Object} req The HTTP request.
+ * @return {Promise<Object>} The action, its data and the files by part name.
+ */
+function parseRequest(req) {
+  const type = req.headers["content-type"] || "";
+  if (!type.startsWith("multipart/form-data")) {
+    const body = req.body || {};
+    return Promise.resolve({
+      action: body.action,
+      data: body.data || {},
+      files: {},
+    });
+  }
+
+  return new Promise((resolve, reject) => {
+    const fields = {};
+    const files = {};
+    const busboy = new Busboy({headers: req.headers});
+    busboy.on("field", (name, value) => {
+      fields[name] = value;
+    });
+    busboy.on("file", (name, stream) => {
+      const chunks = [];
+      stream.on("data", (chunk) => chunks.push(chunk));
+      stream.on("end", () => {
+        files[name] = Buffer.concat(chunks);
+      });
+    });
+    busboy.on("error", reject);
+    busboy.on("finish", () => {
+      try {
+        resolve({
+          action: fields.action,
+          data: JSON.parse(fields.data || "{}"),
+          files: files,
+        });
+      } catch (error) {
+        reject(error);
+      }
+    });
+    busboy.end(req.rawBody);
+  });
+}
+
+/**
+ * The JPEG sent with an item: the file part named by its 'image_field', or
+ * its base64 'image_data'.
+ * @param {Object} item The item the image belongs to.
+ * @param {Object} files The request's file parts by name.
+ * @return {?Buffer} The image bytes, or null when the item has none.
+ */
+function itemImage(item, files) {
+  if (item.image_field && files[item.image_field]) {
+    return files[item.image_field];
+  }
+  if (item.image_data) {
+    return Buffer.from(item.image_data, "base64");
+  }
+  return null;
+}
+
+/**
+ * Store a sheet image in Cloud Storage.
+ * @param {string} scanId The scan the image belongs to.
+ * @param {Buffer} image The JPEG bytes.
+ * @return {Promise<string>} The image's path in the default bucket.
+ */
+async function saveImage(scanId, image) {
+  const path = `scans/${scanId}.jpg`;
+  await admin.storage().bucket().file(path).save(image, {
+    contentType: "image/jpeg",
+  });
+  return path;
+}
+
+/**
+ * Store scanned sheets in scan_results. Results are keyed by their scanId, so
+ * a batch the Pi retries after a lost response is not stored twice.
+ * @param {Object} data {examId, results, timestamp}; each result may carry
+ *     its scanId, timestamp, queue itemId and image.
+ * @param {Object} files The request's file parts by name.
+ * @return {Promise<Object>} The itemIds of the stored results.
+ */
+async function saveScanResults(data, files) {
+  const db = admin.firestore();
+  const results = Array.isArray(data.results) ? data.results : [];
+  const batch = db.batch();
+  const acknowledged = [];
+
+  for (const result of results) {
+    const scanId = result.scanId || data.scanId;
+    const ref = scanId ?
+      db.collection("scan_results").doc(scanId) :
+      db.collection("scan_results").doc();
+
+    // Single results may carry their image at the top level, as sent by
+    // earlier versions of the Pi
+    let image = itemImage(result, files);
+    if (!image && results.length === 1) {
+      image = itemImage(data, files);
+    }
+
+    const doc = {
+      examId: data.examId || null,
+      scanId: ref.id,
+      studentId: result.student_id || null,
+      subjectId: result.subject_id || null,
+      answers: result.answers || {},
+      multipleMarks: result.multiple_marks || [],
+      score: result.score !== undefined ? result.score : null,
+      totalKeyed: result.total_keyed !== undefined ? result.total_keyed : null,
+      confidence: result.confidence !== undefined ? result.confidence : null,
+      processingTime: result.processing_time || null,
+      scannedAt: result.timestamp || data.timestamp || null,
+      timestamp: admin.firestore.FieldValue.serverTimestamp(),
+      scannedBy: "raspberry_pi",
+    };
+    if (image) {
+      doc.imagePath = await saveImage(ref.id, image);
+    }
+
+    batch.set(ref, doc, {merge: true});
+    if (result.itemId !== undefined) {
+      acknowledged.push(result.itemId);
+    }
+  }
+
+  await batch.commit();
+  return {acknowledged: acknowledged};
+}
+
+/**
+ * Store a sheet image the Pi uploads after its results, and link it from the
+ * scan's scan_results document.
+ * @param {Object} data {scanId, examId, studentId, timestamp} and the image.
+ * @param {Object} files The request's file parts by name.
+ * @return {Promise<Object>} The image's storage path.
+ */
+async function saveScanImage(data, files) {
+  const image = itemImage(data, files);
+  if (!data.scanId || !image) {
+    throw new Error("save_scan_image needs a scanId and an image");
+  }
+
+  const imagePath = await saveImage(data.scanId, image);
+  // Merged, as the image may arrive before or after the scan's results
+  await admin.firestore().collection("scan_results").doc(data.scanId).set({
+    scanId: data.scanId,
+    imagePath: imagePath,
+  }, {merge: true});
+  return {imagePath: imagePath};
+}
+
+/**
+ * Store the Pi's status in raspberry_pi_status/current. A partial update
+ * holds only the fields that changed and is merged into the stored status;
+ * otherwise the status replaces it.
+ * @param {Object} data {status, partial}.
+ * @return {Promise<Object>} Nothing to report back.
+ */
+async function updateRaspberryPiStatus(data) {
+  const status = Object.assign({}, data.status, {
+    updatedAt: admin.firestore.FieldValue.serverTimestamp(),
+  });
+  await admin.firestore().collection("raspberry_pi_status").doc("current")
+      .set(status, {merge: Boolean(data.partial)});
+  return {};
+}
+
+const RASPBERRY_PI_ACTIONS = {
+  save_scan_results: saveScanResults,
+  save_scan_image: saveScanImage,
+  update_raspberry_pi_status: updateRaspberryPiStatus,
+};
+
+// Receives scan results and scanner status from the Raspberry Pi scanner
+exports.raspberryPiAPI = functions.https.onRequest(async (req, res) => {
+  if (req.method !== "POST") {
+    return res.status(405).json({success: false, error: "Only POST allowed"});
+  }
+
+  let request;
+  try {
+    request = await parseRequest(req);
+  } catch (error) {
+    return res.status(400).json({success: false, error: "Invalid request"});
+  }
+
+  const handler = RASPBERRY_PI_ACTIONS[request.action];
+  if (!handler) {
+    return res.status(400).json({
+      success: false,
+      error: `Unknown action: ${request.action}`,
+    });
+  }
+
+  try {
+    const result = await handler(request.data, request.files);
+    return res.json(Object.assign({success: true}, result));
+  } catch (error) {
+    functions.logger.error(`${request.action} failed`, error);
+    return res.status(500).json({success: false, error: error.message});
+  }
+});
+
 
 
 
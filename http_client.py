@@ -0,0 +1,143 @@
+"""
+Shared outbound HTTP client for the Rosec Raspberry Pi APIs
+This module handles:
+- One keep-alive requests.Session per destination, so TCP/TLS connections are reused
+- Per-destination connection pool limits and default timeouts
+- Latency and error counters per destination
+"""
+
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 4           # Connections kept open per destination
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 10.0
+
+class HttpClient:
+    """Pooled HTTP client keyed by destination (scheme://host:port).
+
+    `limits` maps a destination to a dict with 'pool_size' and/or 'timeout'
+    overriding the defaults for it. Only connection failures are retried here,
+    and only once (nothing has been sent yet); callers own every other retry.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE,
+                 timeout=(DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT), limits=None):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.limits = dict(limits or {})
+        self._sessions = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def destination(url):
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def configure(self, url, pool_size=None, timeout=None):
+        """Set the pool size and/or default timeout for the destination of `url`"""
+        destination = self.destination(url)
+        with self._lock:
+            limits = self.limits.setdefault(destination, {})
+            if pool_size is not None:
+                limits['pool_size'] = pool_size
+            if timeout is not None:
+                limits['timeout'] = timeout
+            # Rebuild the session on next use so a new pool size takes effect
+            session = self._sessions.pop(destination, None)
+        if session is not None:
+            session.close()
+
+    def session(self, url):
+        """The shared session for the destination of `url`"""
+        destination = self.destination(url)
+        with self._lock:
+            session = self._sessions.get(destination)
+            if session is None:
+                pool_size = self.limits.get(destination, {}).get('pool_size', self.pool_size)
+                retries = Retry(total=1, connect=1, read=False, status=False, redirect=False)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                                      pool_block=True, max_retries=retries)
+                session = requests.Session()
+                session.mount(destination + '/', adapter)
+                self._sessions[destination] = session
+                self._stats.setdefault(destination, {
+                    'requests': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_error': None
+                })
+            return session
+
+    def request(self, method, url, **kwargs):
+        """Send a request over the destination's pooled session and record its latency"""
+        destination = self.destination(url)
+        session = self.session(url)
+        kwargs.setdefault('timeout', self.limits.get(destination, {}).get('timeout', self.timeout))
+
+        started = time.monotonic()
+        error = None
+        try:
+            response = session.request(method, url, **kwargs)
+            if response.status_code >= 500:
+                error = f"HTTP {response.status_code}"
+            return response
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            elapsed = (time.monotonic() - started) * 1000.0
+            with self._lock:
+                stats = self._stats[destination]
+                stats['requests'] += 1
+                stats['total_ms'] += elapsed
+                stats['max_ms'] = max(stats['max_ms'], elapsed)
+                if error is not None:
+                    stats['errors'] += 1
+                    stats['last_error'] = error
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        """Request count, error count and latency per destination"""
+        with self._lock:
+            return {
+                destination: {
+                    'requests': stats['requests'],
+                    'errors': stats['errors'],
+                    'avg_ms': round(stats['total_ms'] / stats['requests'], 1) if stats['requests'] else 0.0,
+                    'max_ms': round(stats['max_ms'], 1),
+                    'last_error': stats['last_error']
+                }
+                for destination, stats in self._stats.items()
+            }
+
+    def close(self):
+        """Close every pooled connection"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions = {}
+        for session in sessions:
+            session.close()
+
+# Client shared by everything in the process
+client = HttpClient()
+
+def get(url, **kwargs):
+    return client.get(url, **kwargs)
+
+def post(url, **kwargs):
+    return client.post(url, **kwargs)
+
+def stats():
+    return client.stats()
@@ -0,0 +1,45 @@
+"""
+Deferred imports for the Rosec scanner
+This module handles:
+- Standing in for heavy modules (OpenCV, NumPy and the OMR engine) until first use
+- Importing each one exactly once, even when several threads need it at the same time
+"""
+
+import importlib
+import threading
+
+class LazyModule:
+    """A module that is imported on first attribute access.
+
+    `cv2 = LazyModule('cv2')` at module level costs nothing; the first
+    `cv2.imencode(...)` imports OpenCV, under a lock so concurrent first
+    uses wait for the one import. `load()` imports it ahead of time, e.g.
+    from a warm-up thread.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def load(self):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+                module = self._module
+        return module
+
+    def __getattr__(self, attr):
+        if attr in ('_name', '_module', '_lock'):
+            # Not set up yet, e.g. while copying; never worth an import
+            raise AttributeError(attr)
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        return f"<lazy module '{self._name}'{' (loaded)' if self.loaded else ''}>"
@@ -0,0 +1,96 @@
+"""
+Background system metrics for the Rosec scanner
+This module handles:
+- Sampling CPU, memory, temperature and camera readings on one background thread
+- Keeping the samples in a fixed-size ring buffer
+- Serving the latest sample instantly and downsampled history series
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 2.0      # Seconds between samples
+DEFAULT_HISTORY = 1800      # Samples kept (an hour at the default interval)
+DEFAULT_POINTS = 120        # Points per series returned by history()
+
+class MetricsSampler:
+    """Calls each probe every `interval` seconds and keeps the readings.
+
+    `probes` maps a metric name to a function returning its current value;
+    probes must not block (e.g. psutil.cpu_percent(interval=None)). A probe
+    that raises is recorded as None for that sample.
+    """
+
+    def __init__(self, probes, interval=DEFAULT_INTERVAL, history=DEFAULT_HISTORY):
+        self.probes = probes
+        self.interval = interval
+        self._samples = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start sampling on a background thread"""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='metrics-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.sample()
+            self._stop.wait(self.interval)
+
+    def sample(self):
+        """Take one sample now, record it and return it"""
+        sample = {'timestamp': time.time()}
+        for name, probe in self.probes.items():
+            try:
+                sample[name] = probe()
+            except Exception as e:
+                logger.debug(f"Metric {name} unavailable: {e}")
+                sample[name] = None
+        with self._lock:
+            self._samples.append(sample)
+        return sample
+
+    def latest(self):
+        """The newest sample, taking one first if none has been recorded yet"""
+        with self._lock:
+            if self._samples:
+                return self._samples[-1]
+        return self.sample()
+
+    def history(self, seconds=None, points=DEFAULT_POINTS):
+        """Series of the last `seconds` (all kept samples if None), averaged down to at most `points` points.
+
+        Returns {'timestamps': [...], 'series': {name: [...]}}.
+        """
+        with self._lock:
+            samples = list(self._samples)
+        if seconds is not None:
+            since = time.time() - seconds
+            samples = [sample for sample in samples if sample['timestamp'] >= since]
+
+        points = max(1, int(points))
+        bucket_size = max(1, -(-len(samples) // points))
+        timestamps = []
+        series = {name: [] for name in self.probes}
+        for start in range(0, len(samples), bucket_size):
+            bucket = samples[start:start + bucket_size]
+            timestamps.append(round(bucket[-1]['timestamp'], 1))
+            for name in self.probes:
+                values = [sample[name] for sample in bucket if isinstance(sample.get(name), (int, float))]
+                series[name].append(round(sum(values) / len(values), 2) if values else None)
+        return {'timestamps': timestamps, 'series': series}
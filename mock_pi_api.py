@@ -1,17 +1,20 @@
 from flask import Flask, jsonify, request
 from datetime import datetime, timezone
-import requests
+import http_client
+import result_store
 import json
-import firebase_admin
-from firebase_admin import credentials, firestore
+import hashlib
+import os
+import firebase_client
 
 # Initialize Flask
 app = Flask(__name__)
 
-# Initialize Firebase Admin SDK
-cred = credentials.Certificate("serviceAccountKey.json.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+# Scan results recorded by /api/scan, served by /api/scan-results; the database
+# sits beside this script and is only created by the first scan or query
+RESULT_STORE_PATH = os.environ.get('RESULT_STORE_PATH',
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_scan_results.db'))
+scan_results = result_store.ScanResultStore(RESULT_STORE_PATH)
 
 # Configuration - Pi API endpoints remain mocked
 FIREBASE_PROJECT_ID = "rosec-57d1d"
@@ -107,6 +110,9 @@ def scan():
 
     # Fake answers
     answers = {"1": "A", "2": "B", "3": "D"}
+    timestamp = datetime.utcnow().isoformat()
+    scan_results.add({"answers": answers, "confidence": 0.97, "scannedBy": "mockDevice"},
+                     exam_id, student_id, None, timestamp)
 
     # Prepare data for Firebase Cloud Function (same format as real Pi API)
     firebase_data = {
@@ -117,7 +123,7 @@ def scan():
             'answers': answers,
             'confidence': 0.97,
             'processingTime': 1.2,
-            'timestamp': datetime.utcnow().isoformat(),
+            'timestamp': timestamp,
             'scannedBy': 'mockDevice',
             'scannedByEmail': 'mock@rosec.com'
         }
@@ -126,7 +132,7 @@ def scan():
     # Send to Firebase Cloud Function (optional - for testing)
     firebase_success = False
     try:
-        response = requests.post(FIREBASE_API_URL, json=firebase_data, timeout=5)
+        response = http_client.post(FIREBASE_API_URL, json=firebase_data, timeout=5)
         firebase_success = response.status_code == 200
         print(f"Firebase sync: {'Success' if firebase_success else 'Failed'}")
     except Exception as e:
@@ -146,10 +152,19 @@ def scan():
 # Additional endpoints for Firestore testing
 @app.route('/api/exam/<exam_id>', methods=['GET'])
 def get_exam_template(exam_id):
-    """Mock endpoint to simulate getting exam template from Firestore"""
-    return jsonify({
-        "success": True,
-        "template": {
+    """Exam template from Firestore (or a mock one), with an ETag for conditional requests"""
+    template = None
+    try:
+        # Firebase is only initialized when a template is first asked for
+        snapshot = firebase_client.firestore_client().collection('exams').document(exam_id).get()
+        if snapshot.exists:
+            template = json.loads(json.dumps(snapshot.to_dict(), default=str))
+            template.setdefault("examId", exam_id)
+    except Exception as e:
+        print(f"Firestore template error: {e}")
+
+    if template is None:
+        template = {
             "examId": exam_id,
             "title": f"Mock Exam {exam_id}",
             "totalQuestions": 50,
@@ -161,33 +176,20 @@ def get_exam_template(exam_id):
                 "bubbleDetectionThreshold": 0.7
             }
         }
-    })
+
+    # Scanners send back the ETag they cached and get a 304 while the template is unchanged
+    response = jsonify({"success": True, "template": template})
+    response.set_etag(hashlib.sha1(json.dumps(template, sort_keys=True).encode('utf-8')).hexdigest())
+    return response.make_conditional(request)
 
 @app.route('/api/scan-results', methods=['GET'])
 def get_scan_results():
-    """Mock endpoint to get recent scan results"""
+    """Scan results recorded by this mock, with the same filters and paging as the Pi API"""
+    page = scan_results.query(**result_store.query_args(request.args))
     return jsonify({
         "success": True,
-        "results": [
-            {
-                "id": "scan_001",
-                "examId": "mock_exam_2025",
-                "studentId": "20250001",
-                "answers": {"1": "A", "2": "B", "3": "D"},
-                "confidence": 0.97,
-                "timestamp": datetime.utcnow().isoformat(),
-                "scannedBy": "mockDevice"
-            },
-            {
-                "id": "scan_002", 
-                "examId": "mock_exam_2025",
-                "studentId": "20250002",
-                "answers": {"1": "B", "2": "A", "3": "C"},
-                "confidence": 0.95,
-                "timestamp": datetime.utcnow().isoformat(),
-                "scannedBy": "mockDevice"
-            }
-        ]
+        "results": page['results'],
+        "next_cursor": page['next_cursor']
     })
 
 @app.route('/api/health', methods=['GET'])
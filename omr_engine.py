@@ -0,0 +1,357 @@
+"""
+Optical mark recognition engine for Rosec answer sheets
+This module handles:
+- Compiling an exam template into bubble coordinate and answer-key arrays
+- Caching compiled templates per exam and template version
+- Measuring the fill ratio of every bubble in one vectorized pass
+- Deciding marked answers, their confidence and the score
+- Decoding the student ID and subject ID grids (digits, or letters A-J in letter columns)
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Canonical sheet size in pixels (US Letter at 100 dpi). Bubble coordinates
+# are expressed in this space and scaled to the size of the scanned image.
+SHEET_WIDTH = 850
+SHEET_HEIGHT = 1100
+
+DEFAULT_CHOICES = ['A', 'B', 'C', 'D']
+DEFAULT_TOTAL_QUESTIONS = 25
+DEFAULT_BUBBLE_THRESHOLD = 0.7
+DEFAULT_STUDENT_ID_LENGTH = 8
+DEFAULT_SUBJECT_ID_LENGTH = 4
+
+# Leading ID columns that hold letters A-J instead of digits 0-9. Subject IDs
+# are one letter and three digits, e.g. 'C204'.
+DEFAULT_STUDENT_ID_LETTERS = 0
+DEFAULT_SUBJECT_ID_LETTERS = 1
+DIGITS = '0123456789'
+LETTERS = 'ABCDEFGHIJ'
+
+# Sheet layout, as fractions of the sheet width/height. ID regions hold one
+# column of ten bubbles per ID character: digits 0-9 top to bottom, or A-J
+# in letter columns.
+DEFAULT_LAYOUT = {
+    'studentIdRegion': [0.06, 0.06, 0.60, 0.30],
+    'subjectIdRegion': [0.66, 0.06, 0.94, 0.30],
+    'answerRegion': [0.06, 0.34, 0.94, 0.96],
+    'questionsPerColumn': 25,
+    'labelWidth': 0.3,      # Part of each question column used by the number
+    'bubbleScale': 0.7,     # Bubble diameter relative to its cell
+}
+
+def get_choices(exam_template):
+    """Return the choice letters of a template ('choiceOptions' may be a list or a count)"""
+    options = exam_template.get('choiceOptions', exam_template.get('choices'))
+    if isinstance(options, (list, tuple)) and options:
+        return [str(option) for option in options]
+    if isinstance(options, (int, str)) and str(options).isdigit() and int(options) > 0:
+        return [chr(ord('A') + i) for i in range(int(options))]
+    return list(DEFAULT_CHOICES)
+
+def get_scanner_setting(exam_template, name, default):
+    """Read a scanner setting from 'scannerSettings', falling back to the top level"""
+    settings = exam_template.get('scannerSettings') or {}
+    value = settings.get(name, exam_template.get(name))
+    return default if value is None else value
+
+def get_layout(exam_template):
+    """Merge the template's 'layout' overrides into the default layout"""
+    layout = dict(DEFAULT_LAYOUT)
+    layout.update(exam_template.get('layout') or {})
+    return layout
+
+def grid_centers(region, rows, cols, columns_per_block=1, label_width=0.0):
+    """Centers of a rows x cols bubble grid laid out inside a normalized region.
+
+    The grid is split into `columns_per_block` side-by-side blocks of `rows` rows;
+    the first `label_width` of every block is left free for printed labels.
+    Returns an array of shape (rows * columns_per_block, cols, 2) in sheet pixels.
+    """
+    x0, y0, x1, y1 = region
+    block_width = (x1 - x0) / columns_per_block
+    row_height = (y1 - y0) / rows
+    cell_width = block_width * (1.0 - label_width) / cols
+
+    block = np.arange(columns_per_block)[:, None, None]
+    row = np.arange(rows)[None, :, None]
+    col = np.arange(cols)[None, None, :]
+
+    xs = x0 + block * block_width + block_width * label_width + (col + 0.5) * cell_width
+    ys = y0 + (row + 0.5) * row_height
+    xs, ys = np.broadcast_arrays(xs, ys)
+
+    centers = np.stack([xs * SHEET_WIDTH, ys * SHEET_HEIGHT], axis=-1)
+    return centers.reshape(-1, cols, 2), (cell_width * SHEET_WIDTH, row_height * SHEET_HEIGHT)
+
+def answer_bubble_centers(exam_template):
+    """Bubble centers for the answer block, shape (totalQuestions, choices, 2), and the bubble radius"""
+    total_questions = int(exam_template.get('totalQuestions', DEFAULT_TOTAL_QUESTIONS))
+    choices = get_choices(exam_template)
+    layout = get_layout(exam_template)
+
+    per_column = max(1, min(int(layout['questionsPerColumn']), total_questions))
+    blocks = -(-total_questions // per_column)
+    centers, (cell_w, cell_h) = grid_centers(layout['answerRegion'], per_column, len(choices),
+                                             blocks, layout['labelWidth'])
+    radius = 0.5 * layout['bubbleScale'] * min(cell_w, cell_h)
+    return centers[:total_questions], radius
+
+def id_bubble_centers(region, length):
+    """Bubble centers for an ID grid, shape (length, 10, 2), and the bubble radius"""
+    centers, (cell_w, cell_h) = grid_centers(region, 10, length)
+    radius = 0.5 * DEFAULT_LAYOUT['bubbleScale'] * min(cell_w, cell_h)
+    return centers.transpose(1, 0, 2), radius
+
+def bubble_rois(centers, radius, width, height):
+    """Integral-image sampling boxes (x0, x1, y0, y1) for bubbles in a width x height image.
+
+    Only the square inscribed in each bubble is sampled so the printed outline
+    is ignored. `radius` is a scalar or one radius per bubble. Boxes are
+    clipped to the image.
+    """
+    points = np.asarray(centers, dtype=np.float32).reshape(-1, 2)
+    half = np.maximum(1.0, np.asarray(radius, dtype=np.float32) / np.sqrt(2.0))
+    x0 = np.clip(np.rint(points[:, 0] - half), 0, width).astype(np.intp)
+    x1 = np.clip(np.rint(points[:, 0] + half) + 1, 0, width).astype(np.intp)
+    y0 = np.clip(np.rint(points[:, 1] - half), 0, height).astype(np.intp)
+    y1 = np.clip(np.rint(points[:, 1] + half) + 1, 0, height).astype(np.intp)
+    return x0, x1, y0, y1
+
+def sample_fill_ratios(binary, rois, integral=None):
+    """Fraction of dark pixels inside every ROI, computed from one integral image.
+
+    `binary` is a thresholded image where paper is 255 and ink is 0.
+    """
+    if integral is None:
+        integral = cv2.integral(binary)
+    x0, x1, y0, y1 = rois
+    area = (x1 - x0) * (y1 - y0)
+    paper = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+    return np.where(area > 0, 1.0 - paper / (255.0 * np.maximum(area, 1)), 0.0)
+
+def decide_marks(fills, threshold):
+    """Pick the marked choice per row of a (rows, choices) fill matrix.
+
+    Returns (best index, number of marked bubbles, per-row confidence).
+    """
+    ordered = np.sort(fills, axis=1)
+    top = ordered[:, -1]
+    second = ordered[:, -2] if fills.shape[1] > 1 else np.zeros_like(top)
+    marked = (fills >= threshold).sum(axis=1)
+
+    confidence = np.where(
+        marked == 1,
+        np.clip((top - second) / threshold, 0.0, 1.0),
+        np.where(marked == 0, np.clip((threshold - top) / threshold, 0.0, 1.0), 0.0)
+    )
+    return fills.argmax(axis=1), marked, confidence
+
+def template_version(exam_template):
+    """Version token of a template: its version/updatedAt fields, or a content hash"""
+    parts = [exam_template.get(name) for name in ('version', 'updatedAt')]
+    if any(part is not None for part in parts):
+        return ':'.join('' if part is None else str(part) for part in parts)
+    encoded = json.dumps(exam_template, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()
+
+class CompiledTemplate:
+    """Precomputed bubble geometry and answer key for one exam template"""
+
+    def __init__(self, exam_template):
+        self.exam_id = exam_template.get('examId')
+        self.version = template_version(exam_template)
+        self.choices = get_choices(exam_template)
+        self.threshold = float(get_scanner_setting(exam_template, 'bubbleDetectionThreshold',
+                                                   DEFAULT_BUBBLE_THRESHOLD))
+
+        answer_centers, answer_radius = answer_bubble_centers(exam_template)
+        self.total_questions = answer_centers.shape[0]
+
+        # Answer key as choice indices, -1 where the question has no key
+        answer_key = exam_template.get('answerKey') or {}
+        lookup = {choice: index for index, choice in enumerate(self.choices)}
+        self.answer_key = np.array([lookup.get(answer_key.get(str(number)), -1)
+                                    for number in range(1, self.total_questions + 1)],
+                                   dtype=np.intp)
+
+        # All bubbles of the sheet go into one flat array so a scan samples them
+        # in a single pass; each field keeps (slice, rows) into that array.
+        layout = get_layout(exam_template)
+        groups = [('answers', answer_centers, answer_radius)]
+        self.id_alphabets = {}
+        for field, region, prefix, default_length, default_letters in (
+                ('student_id', 'studentIdRegion', 'studentId', DEFAULT_STUDENT_ID_LENGTH, DEFAULT_STUDENT_ID_LETTERS),
+                ('subject_id', 'subjectIdRegion', 'subjectId', DEFAULT_SUBJECT_ID_LENGTH, DEFAULT_SUBJECT_ID_LETTERS)):
+            length = int(get_scanner_setting(exam_template, f'{prefix}Length', default_length))
+            if length > 0:
+                groups.append((field, *id_bubble_centers(layout[region], length)))
+                letters = int(get_scanner_setting(exam_template, f'{prefix}Letters', default_letters))
+                self.id_alphabets[field] = [LETTERS if column < letters else DIGITS for column in range(length)]
+
+        self.fields = {}
+        centers, radii, start = [], [], 0
+        for field, field_centers, field_radius in groups:
+            flat = field_centers.reshape(-1, 2)
+            self.fields[field] = (slice(start, start + len(flat)), field_centers.shape[0])
+            centers.append(flat)
+            radii.append(np.full(len(flat), field_radius))
+            start += len(flat)
+        self.centers = np.concatenate(centers)
+        self.radii = np.concatenate(radii)
+
+        # Canonical-sheet rectangle holding every bubble, the only part that gets warped
+        margin = float(self.radii.max()) * 2
+        lower = np.maximum(self.centers.min(axis=0) - margin, 0)
+        upper = np.minimum(self.centers.max(axis=0) + margin, [SHEET_WIDTH, SHEET_HEIGHT])
+        self.bounds = tuple(int(value) for value in np.concatenate([np.floor(lower), np.ceil(upper)]))
+
+        self._rois = {}
+        self._region_rois = None
+
+    def __getstate__(self):
+        # Sent to worker processes without the per-size ROI caches
+        state = self.__dict__.copy()
+        state['_rois'] = {}
+        state['_region_rois'] = None
+        return state
+
+    def rois(self, width, height):
+        """Sampling boxes of every bubble for an image of the given size (cached per size)"""
+        key = (width, height)
+        rois = self._rois.get(key)
+        if rois is None:
+            scale = np.array([width / SHEET_WIDTH, height / SHEET_HEIGHT])
+            rois = bubble_rois(self.centers * scale, self.radii * scale.min(), width, height)
+            self._rois[key] = rois
+        return rois
+
+    def region_rois(self):
+        """Sampling boxes of every bubble inside the warped `bounds` region"""
+        if self._region_rois is None:
+            x0, y0, x1, y1 = self.bounds
+            self._region_rois = bubble_rois(self.centers - [x0, y0], self.radii, x1 - x0, y1 - y0)
+        return self._region_rois
+
+    def field_fills(self, fills, field):
+        """The (rows, bubbles per row) fill matrix of one field, or None if the sheet has no such field"""
+        if field not in self.fields:
+            return None
+        section, rows = self.fields[field]
+        return fills[section].reshape(rows, -1)
+
+def compile_template(exam_template):
+    """Compile an exam template (the shape /api/exam/<exam_id> returns)"""
+    return CompiledTemplate(exam_template)
+
+class TemplateCache:
+    """Bounded LRU cache of compiled templates keyed by (examId, template version)"""
+
+    def __init__(self, max_size=16):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, exam_template):
+        """Return the compiled template, compiling it on a miss"""
+        key = (exam_template.get('examId'), template_version(exam_template))
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+
+        compiled = compile_template(exam_template)
+        with self._lock:
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def invalidate(self, exam_id=None):
+        """Drop the compiled templates of one exam, or all of them. Returns the number dropped"""
+        with self._lock:
+            keys = [key for key in self._entries if exam_id is None or key[0] == exam_id]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def stats(self):
+        """Cache size and hit counters"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+# Shared cache used by the scanner
+template_cache = TemplateCache()
+
+def decode_id(fills, threshold, alphabets=None):
+    """Decode an ID grid fill matrix of shape (characters, 10).
+
+    `alphabets` gives the ten symbols of each column, top to bottom (digits
+    0-9 when not given). Unreadable characters (blank or more than one
+    bubble) come back as '?'. Returns (id string, per-character confidence list).
+    """
+    best, marked, confidence = decide_marks(fills, threshold)
+    alphabets = alphabets or [DIGITS] * len(best)
+    characters = ''.join(alphabet[index] if count == 1 else '?'
+                         for index, count, alphabet in zip(best.tolist(), marked.tolist(), alphabets))
+    return characters, [round(value, 3) for value in np.where(marked == 1, confidence, 0.0).tolist()]
+
+def read_sheet(binary, compiled, integral=None, aligned=False):
+    """Read every bubble of a thresholded sheet image: answers, student ID and subject ID.
+
+    With `aligned` the image is the warped `compiled.bounds` region of the
+    sheet; otherwise the whole image is taken as the sheet.
+    """
+    if aligned:
+        rois = compiled.region_rois()
+    else:
+        height, width = binary.shape[:2]
+        rois = compiled.rois(width, height)
+    fills = sample_fill_ratios(binary, rois, integral)
+
+    answer_fills = compiled.field_fills(fills, 'answers')
+    best, marked, confidence = decide_marks(answer_fills, compiled.threshold)
+    detected = np.where(marked == 1, best, -1)
+    keyed = compiled.answer_key >= 0
+
+    answers = {}
+    multiple_marks = []
+    for number, (choice, count) in enumerate(zip(detected.tolist(), marked.tolist()), start=1):
+        answers[str(number)] = compiled.choices[choice] if choice >= 0 else None
+        if count > 1:
+            multiple_marks.append(str(number))
+
+    results = {
+        'answers': answers,
+        'multiple_marks': multiple_marks,
+        'confidence': round(float(confidence.mean()), 3) if len(confidence) else 0.0,
+        'score': int(((detected == compiled.answer_key) & keyed).sum()),
+        'total_keyed': int(keyed.sum())
+    }
+
+    for field in ('student_id', 'subject_id'):
+        id_fills = compiled.field_fills(fills, field)
+        if id_fills is None:
+            results[field], results[f'{field}_confidence'] = None, []
+        else:
+            results[field], results[f'{field}_confidence'] = decode_id(id_fills, compiled.threshold,
+                                                                       compiled.id_alphabets.get(field))
+
+    return results
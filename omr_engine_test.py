@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+OMR Engine Test Suite for the Rosec scanner
+Renders synthetic answer sheets, photographs them at an angle and checks
+that omr_engine and sheet_alignment read back what was filled in
+"""
+
+import sys
+
+import cv2
+import numpy as np
+
+import omr_engine
+import scan_workers
+import sheet_alignment
+
+EXAM_TEMPLATE = {
+    'examId': 'synthetic',
+    'totalQuestions': 30,
+    'choiceOptions': 4,
+    'answerKey': {str(number): 'ABCD'[number % 4] for number in range(1, 31)}
+}
+
+class OMREngineTester:
+    def __init__(self, scale=2.0):
+        self.scale = scale
+        self.compiled = omr_engine.compile_template(EXAM_TEMPLATE)
+        self.tests_run = 0
+        self.tests_passed = 0
+
+        # The key's answers filled in, except a wrong answer to question 3, a blank
+        # question 7 and two marks on question 12
+        self.answers = dict(EXAM_TEMPLATE['answerKey'])
+        self.answers['3'] = 'A'
+        self.answers['7'] = None
+        self.student_id = '20250417'
+        self.subject_id = 'C204'
+
+    def run_test(self, name, test_func):
+        """Run a single test"""
+        self.tests_run += 1
+        print(f"\n🔍 Testing {name}...")
+
+        try:
+            success = test_func()
+            if success:
+                self.tests_passed += 1
+                print(f"✅ Passed - {name}")
+            else:
+                print(f"❌ Failed - {name}")
+            return success
+        except Exception as e:
+            print(f"❌ Failed - {name}: {str(e)}")
+            return False
+
+    def render_sheet(self, markers=True):
+        """The answer sheet as printed and filled in, at `scale` times the canonical size"""
+        scale = self.scale
+        compiled = self.compiled
+        sheet = np.full((int(omr_engine.SHEET_HEIGHT * scale), int(omr_engine.SHEET_WIDTH * scale), 3),
+                        235, np.uint8)
+        for (x, y), radius in zip(compiled.centers, compiled.radii):
+            cv2.circle(sheet, (int(x * scale), int(y * scale)), int(radius * scale), (0, 0, 0), 1)
+
+        def fill(field, row, column):
+            section, rows = compiled.fields[field]
+            x, y = compiled.centers[section].reshape(rows, -1, 2)[row, column] * scale
+            radius = compiled.radii[section][0] * scale
+            cv2.circle(sheet, (int(x), int(y)), int(radius * 0.9), (30, 30, 30), -1)
+
+        for number, answer in self.answers.items():
+            if answer:
+                fill('answers', int(number) - 1, compiled.choices.index(answer))
+        fill('answers', 11, 1)
+        for field, value in (('student_id', self.student_id), ('subject_id', self.subject_id)):
+            for column, character in enumerate(value):
+                fill(field, column, compiled.id_alphabets[field][column].index(character))
+
+        if markers:
+            half = sheet_alignment.FIDUCIAL_SIZE * scale / 2
+            for x, y in sheet_alignment.FIDUCIAL_CENTERS:
+                cv2.rectangle(sheet, (int(x * scale - half), int(y * scale - half)),
+                              (int(x * scale + half), int(y * scale + half)), (0, 0, 0), -1)
+        return sheet
+
+    def photograph(self, sheet, angle=8.0, size=(1920, 1080)):
+        """A camera frame of the sheet: rotated, in perspective and on a grey table"""
+        height, width = sheet.shape[:2]
+        rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 0.9 * size[1] / height)
+        rotation[0, 2] += size[0] / 2 - width / 2
+        rotation[1, 2] += size[1] / 2 - height / 2
+        corners = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+        projected = cv2.transform(corners[None], rotation)[0] + np.float32([[20, 0], [-10, 10], [0, 0], [5, -15]])
+        perspective = cv2.getPerspectiveTransform(corners, projected)
+        return cv2.warpPerspective(sheet, perspective, size, borderValue=(90, 90, 90))
+
+    def check_results(self, results):
+        """Whether the read answers and IDs are the ones filled in"""
+        expected = {number: answer for number, answer in self.answers.items() if number != '12'}
+        expected['12'] = None
+        wrong = {number: results['answers'].get(number) for number, answer in expected.items()
+                 if results['answers'].get(number) != answer}
+        if wrong:
+            print(f"Misread answers: {wrong}")
+            return False
+        if results['multiple_marks'] != ['12']:
+            print(f"Multiple marks: {results['multiple_marks']}")
+            return False
+        if results['score'] != 27 or results['total_keyed'] != 30:
+            print(f"Score: {results['score']}/{results['total_keyed']}")
+            return False
+        if results['student_id'] != self.student_id or results['subject_id'] != self.subject_id:
+            print(f"IDs: {results['student_id']} / {results['subject_id']}")
+            return False
+        return True
+
+    def test_flat_sheet(self):
+        """Test reading a flat scan of the whole sheet"""
+        gray = cv2.cvtColor(self.render_sheet(), cv2.COLOR_BGR2GRAY)
+        _, thresh = cv2.threshold(cv2.GaussianBlur(gray, (5, 5), 0), 0, 255,
+                                  cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return self.check_results(omr_engine.read_sheet(thresh, self.compiled))
+
+    def test_fiducials_found(self):
+        """Test that the corner markers are found in a tilted camera frame"""
+        alignment = sheet_alignment.locate_sheet(self.photograph(self.render_sheet()))
+        if alignment is None:
+            print("Corner markers not found")
+            return False
+        return not alignment.reused
+
+    def test_camera_frame(self):
+        """Test the de-skewed read of a tilted camera frame"""
+        frame = self.photograph(self.render_sheet(), angle=-6.0)
+        results, alignment = scan_workers.process_frame(frame, self.compiled)
+        if not results['aligned']:
+            print("Frame was read without alignment")
+            return False
+        return self.check_results(results)
+
+    def test_homography_reuse(self):
+        """Test that an unmoved sheet reuses the previous frame's homography"""
+        frame = self.photograph(self.render_sheet())
+        _, alignment = scan_workers.process_frame(frame, self.compiled)
+        results, _ = scan_workers.process_frame(frame, self.compiled, previous_alignment=alignment)
+        if not results['homography_reused']:
+            print("Homography was not reused")
+            return False
+        return self.check_results(results)
+
+    def test_unmarked_frame_rejected(self):
+        """Test that a frame without corner markers is rejected unless reading unaligned is allowed"""
+        page = np.full((1200, 900, 3), 225, np.uint8)
+        for line in range(20):
+            cv2.putText(page, f"lorem ipsum dolor {line}", (60, 60 + line * 55),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.2, (20, 20, 20), 2)
+        try:
+            scan_workers.process_frame(page, self.compiled)
+            print("Frame without markers was read")
+            return False
+        except scan_workers.SheetNotFound as e:
+            if e.reason != 'no_markers':
+                return False
+        results, _ = scan_workers.process_frame(page, self.compiled, allow_unaligned=True)
+        return results['aligned'] is False
+
+    def test_encoded_upload(self):
+        """Test the quality gate and read of a JPEG-encoded camera frame"""
+        _, encoded = cv2.imencode('.jpg', self.photograph(self.render_sheet(), angle=4.0))
+        results, quality = scan_workers.process_encoded(encoded.tobytes(), self.compiled)
+        if results is None:
+            print(f"Upload rejected: {quality}")
+            return False
+        return self.check_results(results)
+
+def main():
+    """Run all OMR engine tests"""
+    print("🚀 Starting OMR Engine Tests")
+    print("=" * 60)
+
+    tester = OMREngineTester()
+
+    tests = [
+        ("Flat Sheet", tester.test_flat_sheet),
+        ("Corner Markers Found", tester.test_fiducials_found),
+        ("Tilted Camera Frame", tester.test_camera_frame),
+        ("Homography Reuse", tester.test_homography_reuse),
+        ("Unmarked Frame Rejected", tester.test_unmarked_frame_rejected),
+        ("Encoded Upload", tester.test_encoded_upload)
+    ]
+
+    for test_name, test_func in tests:
+        tester.run_test(test_name, test_func)
+
+    # Print summary
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {tester.tests_passed}/{tester.tests_run} tests passed")
+
+    if tester.tests_passed == tester.tests_run:
+        print("🎉 All OMR engine tests passed!")
+        return 0
+    else:
+        failed_tests = tester.tests_run - tester.tests_passed
+        print(f"⚠️  {failed_tests} test(s) failed. Check the issues above.")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Live MJPEG preview for the Rosec scanner
+This module handles:
+- Encoding each grabbed frame once at the preview resolution and quality
+- Fanning the same JPEG bytes out to every connected viewer
+- Pacing the encoder to the slowest viewer instead of queueing frames
+"""
+
+import logging
+import threading
+import time
+
+from lazy_import import LazyModule
+
+cv2 = LazyModule('cv2')
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTH = 640
+DEFAULT_QUALITY = 70
+DEFAULT_MAX_FPS = 15.0
+STALL_TIMEOUT = 10.0        # Seconds a viewer may hold up the stream before it is dropped
+BOUNDARY = 'frame'
+
+def encode_jpeg(image, width=None, quality=DEFAULT_QUALITY):
+    """JPEG bytes of a frame, downscaled to `width` pixels wide when that is smaller"""
+    if width and 0 < width < image.shape[1]:
+        scale = width / image.shape[1]
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    quality = max(1, min(100, quality))
+    _, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
+
+class PreviewStream:
+    """Shared MJPEG encoder for every preview viewer.
+
+    The encoder thread only runs while someone is watching. It encodes the
+    next frame once every viewer has taken the previous one, so the frame
+    rate settles at what the slowest viewer (or `max_fps`) allows and no
+    viewer ever has more than one frame waiting. `get_grabber` returns the
+    current CameraGrabber, which changes when the camera is re-initialized.
+    """
+
+    def __init__(self, get_grabber, width=DEFAULT_WIDTH, quality=DEFAULT_QUALITY, max_fps=DEFAULT_MAX_FPS):
+        self.get_grabber = get_grabber
+        self.width = width
+        self.quality = quality
+        self.max_fps = max_fps
+        self.frames_encoded = 0
+        self._jpeg = None
+        self._sequence = 0
+        self._viewers = {}          # viewer id -> sequence of the last frame it took
+        self._next_viewer = 0
+        self._condition = threading.Condition()
+        self._thread = None
+
+    @property
+    def viewers(self):
+        return len(self._viewers)
+
+    def stats(self):
+        return {'viewers': self.viewers, 'frames_encoded': self.frames_encoded,
+                'width': self.width, 'quality': self.quality, 'max_fps': self.max_fps}
+
+    def _start_encoder(self):
+        # Called with the condition held
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='preview-encoder', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        interval = 1.0 / self.max_fps if self.max_fps > 0 else 0.0
+        camera = None
+        camera_sequence = 0
+        last_encode = 0.0
+
+        while True:
+            with self._condition:
+                # Wait until every viewer has the current frame, dropping any that stall
+                deadline = time.monotonic() + STALL_TIMEOUT
+                while self._viewers and min(self._viewers.values()) < self._sequence:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        stalled = [v for v, seen in self._viewers.items() if seen < self._sequence]
+                        for viewer in stalled:
+                            del self._viewers[viewer]
+                        logger.warning(f"Dropped {len(stalled)} stalled preview viewer(s)")
+                        self._condition.notify_all()
+                        break
+                    self._condition.wait(remaining)
+                if not self._viewers:
+                    self._thread = None
+                    return
+
+            time.sleep(max(0.0, interval - (time.monotonic() - last_encode)))
+
+            grabber = self.get_grabber()
+            if grabber is not camera:
+                # A re-initialized camera numbers its frames from 1 again
+                camera, camera_sequence = grabber, 0
+            entry = grabber.wait_for_frame(camera_sequence, timeout=1.0) if grabber is not None else None
+            if entry is None:
+                time.sleep(0.1)
+                continue
+            _, camera_sequence, frame = entry
+
+            try:
+                jpeg = encode_jpeg(frame, self.width, self.quality)
+            except Exception as e:
+                logger.error(f"Preview encode error: {e}")
+                continue
+            last_encode = time.monotonic()
+
+            with self._condition:
+                self._jpeg = jpeg
+                self._sequence += 1
+                self.frames_encoded += 1
+                self._condition.notify_all()
+
+    def stream(self):
+        """multipart/x-mixed-replace body for one viewer"""
+        with self._condition:
+            viewer = self._next_viewer
+            self._next_viewer += 1
+            self._viewers[viewer] = self._sequence
+            self._start_encoder()
+
+        try:
+            while True:
+                with self._condition:
+                    while viewer in self._viewers and self._sequence <= self._viewers[viewer]:
+                        self._condition.wait(1.0)
+                    if viewer not in self._viewers:
+                        return
+                    jpeg = self._jpeg
+                    self._viewers[viewer] = self._sequence
+                    self._condition.notify_all()
+
+                yield (f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                       f"Content-Length: {len(jpeg)}\r\n\r\n").encode('ascii') + jpeg + b"\r\n"
+        finally:
+            with self._condition:
+                self._viewers.pop(viewer, None)
+                self._condition.notify_all()
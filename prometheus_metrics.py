@@ -0,0 +1,188 @@
+"""
+Prometheus metrics for the Rosec Flask APIs
+This module handles:
+- Counters, gauges and histograms rendered in the Prometheus text exposition format
+- Reading values that other components already keep only when /metrics is scraped
+- Per-route, per-status request counts and latency histograms for a Flask app
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic count per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [(self.name, _labels(self.labelnames, key), value) for key, value in values.items()]
+
+class Gauge(Counter):
+    """Value per label set that may go up and down"""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+class Callback:
+    """Counter or gauge whose values are read from `fn` at scrape time.
+
+    `fn` returns a number, or {label values tuple: number} when there are
+    labels. Values that are None are skipped, e.g. while a component is off.
+    """
+
+    def __init__(self, name, help, fn, kind='gauge', labelnames=()):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        values = self.fn()
+        if not self.labelnames:
+            values = {(): values}
+        return [(self.name, _labels(self.labelnames, key), value)
+                for key, value in values.items() if value is not None]
+
+class Histogram:
+    """Observation counts per bucket, plus their sum and count, per label set"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}       # label values -> [per-bucket counts (last is +Inf), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        samples = []
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((f'{self.name}_bucket',
+                                _labels(self.labelnames, key, [('le', _number(bound))]), cumulative))
+            samples.append((f'{self.name}_sum', _labels(self.labelnames, key), total))
+            samples.append((f'{self.name}_count', _labels(self.labelnames, key), cumulative))
+        return samples
+
+class Registry:
+    """The metrics of one app, rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, fn, kind='gauge', labelnames=()):
+        return self.register(Callback(name, help, fn, kind, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                # One broken reading must not take the whole scrape down
+                lines.append(f'# {metric.name} unavailable: {_escape(e)}')
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(f'{name}{labels} {_number(value)}' for name, labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+def instrument(app, registry, prefix='rosec'):
+    """Count and time every request of a Flask app and serve `registry` at /metrics.
+
+    Requests are labelled by route pattern (not the raw path), method and
+    status code. Streaming responses are timed until their headers are sent.
+    """
+    requests_total = registry.counter(f'{prefix}_http_requests_total', 'HTTP requests handled',
+                                      ('route', 'method', 'status'))
+    latency = registry.histogram(f'{prefix}_http_request_duration_seconds', 'HTTP request latency',
+                                 ('route', 'method', 'status'))
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            labels = {'route': route, 'method': request.method, 'status': response.status_code}
+            requests_total.inc(**labels)
+            latency.observe(time.perf_counter() - start, **labels)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def prometheus_metrics():
+        """Prometheus text exposition of the app's metrics"""
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    return registry
@@ -298,96 +298,131 @@ document.addEventListener('DOMContentLoaded', () => {
 
   // ------------------- Exam Sheet Generator -------------------
 
+  // Scanner sheet geometry. This must match the Raspberry Pi scanner:
+  // omr_engine.DEFAULT_LAYOUT for the bubble grids and sheet_alignment.py for the
+  // four corner markers. Positions are in sheet pixels of a US Letter page at
+  // 100 dpi, so 100 px print as one inch.
+  const SHEET_WIDTH = 850;
+  const SHEET_HEIGHT = 1100;
+  const FIDUCIAL_SIZE = 30;
+  const FIDUCIAL_INSET = 35;
+  const SHEET_LAYOUT = {
+    studentIdRegion: [0.06, 0.06, 0.60, 0.30],
+    subjectIdRegion: [0.66, 0.06, 0.94, 0.30],
+    answerRegion: [0.06, 0.34, 0.94, 0.96],
+    questionsPerColumn: 25,
+    labelWidth: 0.3,
+    bubbleScale: 0.7
+  };
+  const ID_DIGITS = '0123456789';
+  const ID_LETTERS = 'ABCDEFGHIJ';
+
+  // Same as omr_engine.grid_centers: a rows x cols grid in `blocks` side-by-side blocks
+  function gridCenters(region, rows, cols, blocks = 1, labelWidth = 0) {
+    const [x0, y0, x1, y1] = region;
+    const blockWidth = (x1 - x0) / blocks;
+    const rowHeight = (y1 - y0) / rows;
+    const cellWidth = blockWidth * (1 - labelWidth) / cols;
+    const centers = [];
+    for (let block = 0; block < blocks; block++) {
+      for (let row = 0; row < rows; row++) {
+        const cells = [];
+        for (let col = 0; col < cols; col++) {
+          cells.push([
+            (x0 + block * blockWidth + blockWidth * labelWidth + (col + 0.5) * cellWidth) * SHEET_WIDTH,
+            (y0 + (row + 0.5) * rowHeight) * SHEET_HEIGHT
+          ]);
+        }
+        centers.push(cells);
+      }
+    }
+    return { centers, cellWidth: cellWidth * SHEET_WIDTH, rowHeight: rowHeight * SHEET_HEIGHT, blockWidth: blockWidth * SHEET_WIDTH };
+  }
+
+  // A scanner setting from scannerSettings, falling back to the top level (omr_engine.get_scanner_setting)
+  function scannerSetting(exam, name, fallback) {
+    const value = (exam.scannerSettings || {})[name] ?? exam[name];
+    return value ?? fallback;
+  }
+
+  function inches(pixels) {
+    return `${(pixels / 100).toFixed(3)}in`;
+  }
+
+  function bubble(x, y, radius, label) {
+    return `<div class="sheet-bubble" style="left: ${inches(x - radius)}; top: ${inches(y - radius)}; ` +
+      `width: ${inches(2 * radius)}; height: ${inches(2 * radius)}; font-size: ${inches(radius)};">${label}</div>`;
+  }
+
+  function text(x, y, width, content, className = 'sheet-text') {
+    return `<div class="${className}" style="left: ${inches(x)}; top: ${inches(y)}; width: ${inches(width)};">${content}</div>`;
+  }
+
+  function idGrid(title, region, length, letters) {
+    if (length <= 0) return '';
+    const { centers, cellWidth, rowHeight } = gridCenters(region, 10, length);
+    const radius = 0.5 * SHEET_LAYOUT.bubbleScale * Math.min(cellWidth, rowHeight);
+    let html = text(region[0] * SHEET_WIDTH, region[1] * SHEET_HEIGHT - 22, (region[2] - region[0]) * SHEET_WIDTH,
+                    title, 'sheet-label');
+    centers.forEach((cells, row) => {
+      cells.forEach(([x, y], column) => {
+        html += bubble(x, y, radius, (column < letters ? ID_LETTERS : ID_DIGITS)[row]);
+      });
+    });
+    return html;
+  }
+
   function generateExamSheet(exam) {
     if (!exam) return '';
 
-    // Always use the saved HTML if it exists
-    if (exam.generatedSheetHTML && exam.generatedSheetHTML.trim()) {
-      console.log('Using saved generated sheet HTML');
-      return exam.generatedSheetHTML;
-    }
+    // The sheet is always drawn from the template so its bubbles sit where the scanner reads them
+    const totalQuestions = Number(exam.totalQuestions || 30);
+    const options = exam.choiceOptions || exam.choices || 4;
+    const choiceLetters = Array.isArray(options) ? options.map(String)
+      : Array.from({ length: Number(options) }, (_, i) => String.fromCharCode(65 + i));
+    const layout = { ...SHEET_LAYOUT, ...(exam.layout || {}) };
 
-    // This should never happen for new exams, but fallback for old ones
-    console.log('No saved sheet HTML found, this is an old exam');
-
-    const totalQuestions = exam.totalQuestions || 30;
-    const choiceOptions = exam.choiceOptions || exam.choices || 4;
-    const choiceLetters = Array.from({ length: choiceOptions }, (_, i) => String.fromCharCode(65 + i));
-    
     const examTitle = exam.examTitle || exam.name || exam.title || 'Untitled Exam';
     const subjectName = exam.subjectName || exam.subjectId || 'N/A';
     const className = exam.classId || exam.class || 'N/A';
-    const examDate = formatDate(exam.createdAt || exam.dateCreated);
-    const answerKeyMap = new Map(exam.items ? exam.items.map(item => [item.number, item.correctAnswer]) : []);
-
-    return `
-      <div class="exam-sheet">
-        <div class="exam-sheet-header">
-          <div class="exam-sheet-title">${examTitle}</div>
-          <div class="exam-sheet-info">
-            <div><span>Subject:</span> <span>${subjectName}</span></div>
-            <div><span>Class:</span> <span>${className}</span></div>
-            <div><span>Date:</span> <span>${examDate}</span></div>
-            <div><span>Total Questions:</span> <span>${totalQuestions}</span></div>
-          </div>
-        </div>
-
-        <div class="student-info-section">
-          <h3 style="margin: 0 0 15px 0; text-align: center;">STUDENT INFORMATION</h3>
-          <div class="student-info-grid">
-            <div class="info-field">
-              <label>Name:</label>
-              <div class="field-line"></div>
-            </div>
-            <div class="info-field">
-              <label>Student ID:</label>
-              <div class="field-line"></div>
-            </div>
-            <div class="info-field">
-              <label>Section:</label>
-              <div class="field-line"></div>
-            </div>
-            <div class="info-field">
-              <label>Score:</label>
-              <div class="field-line"></div>
-            </div>
-          </div>
-        </div>
-
-        <div class="instructions">
-          <h3>INSTRUCTIONS:</h3>
-          <ul>
-            <li>Use a black or blue pen to fill in the circles completely.</li>
-            <li>Make heavy marks that fill the circle completely.</li>
-            <li>Erase cleanly any marks you wish to change.</li>
-            <li>Make no stray marks on this answer sheet.</li>
-            <li>Choose only one answer per question.</li>
-          </ul>
-        </div>
-
-        <div class="questions-section">
-          <h3 style="margin: 0 0 20px 0; text-align: center;">ANSWER SHEET</h3>
-          ${Array.from({ length: totalQuestions }, (_, i) => {
-            const questionNum = i + 1;
-            const correctAnswer = answerKeyMap.get(questionNum);
-            const answerDisplay = correctAnswer ? `<span style="font-weight: bold; color: green; margin-left: 10px;">(${correctAnswer})</span>` : '';
-            return `
-              <div class="question-item">
-                <div class="question-number">${questionNum}.</div>
-                <div class="question-choices">
-                  ${choiceLetters.map(letter => `
-                    <div class="choice-option">
-                      <div class="choice-bubble">${letter}</div>
-                    </div>
-                  `).join('')}
-                  ${answerDisplay}
-                </div>
-              </div>
-            `;
-          }).join('')}
-        </div>
-      </div>
-    `;
+
+    let html = '';
+
+    // Corner markers the scanner aligns the sheet by
+    [[FIDUCIAL_INSET, FIDUCIAL_INSET], [SHEET_WIDTH - FIDUCIAL_INSET, FIDUCIAL_INSET],
+     [SHEET_WIDTH - FIDUCIAL_INSET, SHEET_HEIGHT - FIDUCIAL_INSET], [FIDUCIAL_INSET, SHEET_HEIGHT - FIDUCIAL_INSET]]
+      .forEach(([x, y]) => {
+        html += `<div class="sheet-marker" style="left: ${inches(x - FIDUCIAL_SIZE / 2)}; top: ${inches(y - FIDUCIAL_SIZE / 2)}; ` +
+          `width: ${inches(FIDUCIAL_SIZE)}; height: ${inches(FIDUCIAL_SIZE)};"></div>`;
+      });
+
+    html += text(70, 12, SHEET_WIDTH - 140, `${examTitle} &middot; ${subjectName} &middot; ${className}`, 'sheet-title');
+
+    html += idGrid('Student ID', layout.studentIdRegion,
+                   Number(scannerSetting(exam, 'studentIdLength', 8)), Number(scannerSetting(exam, 'studentIdLetters', 0)));
+    html += idGrid('Subject ID', layout.subjectIdRegion,
+                   Number(scannerSetting(exam, 'subjectIdLength', 4)), Number(scannerSetting(exam, 'subjectIdLetters', 1)));
+
+    // Name line between the ID grids and the answers
+    const gapTop = layout.studentIdRegion[3] * SHEET_HEIGHT;
+    html += text(layout.answerRegion[0] * SHEET_WIDTH, gapTop + 8, (layout.answerRegion[2] - layout.answerRegion[0]) * SHEET_WIDTH,
+                 'Name: ________________________________ &nbsp; Section: ____________ &nbsp; Date: ____________');
+
+    // Answer bubbles, question numbers in the label part of each column
+    const perColumn = Math.max(1, Math.min(Number(layout.questionsPerColumn), totalQuestions));
+    const blocks = Math.ceil(totalQuestions / perColumn);
+    const grid = gridCenters(layout.answerRegion, perColumn, choiceLetters.length, blocks, layout.labelWidth);
+    const radius = 0.5 * layout.bubbleScale * Math.min(grid.cellWidth, grid.rowHeight);
+    const labelWidth = grid.blockWidth * layout.labelWidth;
+    grid.centers.slice(0, totalQuestions).forEach((cells, index) => {
+      const [firstX, y] = cells[0];
+      html += text(firstX - grid.cellWidth / 2 - labelWidth, y - 7, labelWidth - 6, `${index + 1}.`, 'sheet-number');
+      cells.forEach(([x], choice) => {
+        html += bubble(x, y, radius, choiceLetters[choice]);
+      });
+    });
+
+    return `<div class="exam-sheet">${html}</div>`;
   }
 
   function showExamSheet() {
@@ -446,30 +481,17 @@ document.addEventListener('DOMContentLoaded', () => {
         <head>
           <title>Exam Sheet - ${currentExam.examTitle || 'Untitled'}</title>
           <style>
-            body { 
-              font-family: 'Times New Roman', serif; 
-              margin: 20px; 
-              line-height: 1.4; 
-            }
-            .exam-sheet { max-width: 700px; margin: 0 auto; }
-            .exam-sheet-header { text-align: center; margin-bottom: 30px; border-bottom: 2px solid #333; padding-bottom: 20px; }
-            .exam-sheet-title { font-size: 24px; font-weight: bold; margin-bottom: 10px; text-transform: uppercase; }
-            .exam-sheet-info { display: grid; grid-template-columns: 1fr 1fr; gap: 20px; margin-bottom: 20px; font-size: 14px; }
-            .exam-sheet-info div { display: flex; justify-content: space-between; border-bottom: 1px solid #333; padding-bottom: 2px; }
-            .student-info-section { margin-bottom: 30px; padding: 15px; border: 2px solid #333; }
-            .student-info-grid { display: grid; grid-template-columns: 1fr 1fr; gap: 15px; }
-            .info-field { display: flex; align-items: center; gap: 10px; }
-            .info-field label { font-weight: bold; min-width: 80px; }
-            .info-field .field-line { flex: 1; border-bottom: 1px solid #333; height: 20px; }
-            .instructions { background: #f0f0f0; padding: 15px; margin-bottom: 25px; border-left: 4px solid #333; }
-            .instructions h3 { margin: 0 0 10px 0; font-size: 16px; }
-            .instructions ul { margin: 0; padding-left: 20px; }
-            .questions-section { margin-top: 25px; }
-            .question-item { display: flex; align-items: flex-start; margin-bottom: 20px; padding: 10px; border: 1px solid #ddd; border-radius: 5px; }
-            .question-number { font-weight: bold; margin-right: 15px; min-width: 30px; }
-            .question-choices { display: flex; gap: 20px; flex: 1; }
-            .choice-option { display: flex; align-items: center; gap: 8px; }
-            .choice-bubble { width: 20px; height: 20px; border: 2px solid #333; border-radius: 50%; display: flex; align-items: center; justify-content: center; font-weight: bold; font-size: 12px; }
+            @page { size: letter; margin: 0; }
+            body { margin: 0; font-family: Arial, sans-serif; }
+            /* One US Letter page; every element is placed in inches from its top-left corner */
+            .exam-sheet { position: relative; width: 8.5in; height: 11in; overflow: hidden; background: #fff; }
+            .exam-sheet > div { position: absolute; box-sizing: border-box; }
+            .sheet-marker { background: #000; }
+            .sheet-bubble { border: 1px solid #000; border-radius: 50%; color: #999; display: flex; align-items: center; justify-content: center; line-height: 1; }
+            .sheet-title { font-size: 13px; font-weight: bold; text-align: center; white-space: nowrap; overflow: hidden; }
+            .sheet-label { font-size: 11px; font-weight: bold; }
+            .sheet-text { font-size: 12px; }
+            .sheet-number { font-size: 11px; text-align: right; }
           </style>
         </head>
         <body>
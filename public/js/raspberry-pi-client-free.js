@@ -26,6 +26,14 @@ class RaspberryPiClientFree {
         // Status polling
         this.statusPollingInterval = null;
         this.isPolling = false;
+        
+        // Live updates from /api/events (replaces polling where EventSource is available)
+        this.eventSource = null;
+        this.status = null;
+        this.sessionExamId = null;
+        
+        // Object URL of the latest camera preview
+        this.previewUrl = null;
     }
 
     // Event handling
@@ -107,6 +115,7 @@ class RaspberryPiClientFree {
     // API request helper with retry logic
     async makeRequest(url, options = {}) {
         const fullUrl = `${this.raspberryPiUrl}${url}`;
+        const { responseType = 'json', ...fetchOptions } = options;
         
         const headers = {
             'Content-Type': 'application/json',
@@ -121,7 +130,7 @@ class RaspberryPiClientFree {
             method: 'GET',
             headers: headers,
             timeout: this.timeout,
-            ...options
+            ...fetchOptions
         };
 
         for (let attempt = 1; attempt <= this.retryAttempts; attempt++) {
@@ -136,10 +145,20 @@ class RaspberryPiClientFree {
 
                 clearTimeout(timeoutId);
 
+                // Rejected frames (422) carry the reason in the body and are not worth retrying
+                if (response.status === 422) {
+                    return await response.json();
+                }
+
                 if (!response.ok) {
                     throw new Error(`HTTP ${response.status}: ${response.statusText}`);
                 }
 
+                // Binary endpoints (e.g. the JPEG preview) are returned as a Blob
+                if (responseType === 'blob') {
+                    return await response.blob();
+                }
+
                 const data = await response.json();
                 return data;
 
@@ -193,14 +212,23 @@ class RaspberryPiClientFree {
     }
 
     // Get Camera Preview
-    async getCameraPreview() {
+    async getCameraPreview(options = {}) {
         try {
-            const response = await this.makeRequest('/api/preview');
+            // The preview arrives as raw JPEG bytes; `width` and `quality` shrink it on the Pi
+            const params = new URLSearchParams();
+            if (options.width) params.set('width', options.width);
+            if (options.quality) params.set('quality', options.quality);
+            const query = params.toString() ? `?${params}` : '';
+            const blob = await this.makeRequest(`/api/preview${query}`, { responseType: 'blob' });
             
-            if (response.success) {
-                this.emit('previewUpdate', response.image);
+            // Free the previous preview's object URL before handing out a new one
+            if (this.previewUrl) {
+                URL.revokeObjectURL(this.previewUrl);
             }
+            this.previewUrl = URL.createObjectURL(blob);
             
+            const response = { success: true, image: this.previewUrl };
+            this.emit('previewUpdate', response.image);
             return response;
         } catch (error) {
             console.error('Failed to get camera preview:', error);
@@ -209,6 +237,12 @@ class RaspberryPiClientFree {
         }
     }
 
+    // Live camera preview: use as the src of an <img> element; the Pi streams
+    // MJPEG frames at whatever rate the slowest viewer keeps up with
+    getPreviewStreamUrl() {
+        return `${this.raspberryPiUrl}/api/preview/stream`;
+    }
+
     // Scan Answer Sheet
     async scanAnswerSheet(examTemplate) {
         try {
@@ -225,6 +259,9 @@ class RaspberryPiClientFree {
                 // Save scan results to Firestore
                 await this.saveScanResultsToFirestore(examTemplate.examId, response.results);
                 this.emit('scanCompleted', response.results);
+            } else if (response.reason) {
+                // Blurry, overexposed or missing sheet - the operator should adjust and retry
+                this.emit('scanRejected', { reason: response.reason, quality: response.quality });
             }
             
             return response;
@@ -236,14 +273,83 @@ class RaspberryPiClientFree {
         }
     }
 
+    // Batch scanning: upload many sheet photos (or pass { count } to capture frames)
+    // and receive each sheet's results as soon as the Pi finishes it
+    async scanBatch(examTemplate, files = [], options = {}) {
+        const headers = {};
+        if (this.authToken) {
+            headers['Authorization'] = `Bearer ${this.authToken}`;
+        }
+        
+        let body;
+        if (files.length > 0) {
+            body = new FormData();
+            body.append('exam_template', JSON.stringify(examTemplate));
+            files.forEach(file => body.append('images', file, file.name));
+        } else {
+            headers['Content-Type'] = 'application/json';
+            body = JSON.stringify({ exam_template: examTemplate, count: options.count || 1 });
+        }
+        
+        try {
+            this.emit('batchStarted', { examId: examTemplate.examId });
+            
+            const response = await fetch(`${this.raspberryPiUrl}/api/scan/batch`, {
+                method: 'POST',
+                headers: headers,
+                body: body
+            });
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+            }
+            
+            // One JSON object per line, the last one is the batch summary
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffered = '';
+            let summary = null;
+            
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                
+                buffered += decoder.decode(value, { stream: true });
+                const lines = buffered.split('\n');
+                buffered = lines.pop();
+                
+                for (const line of lines.filter(line => line.trim())) {
+                    const item = JSON.parse(line);
+                    if (item.done) {
+                        summary = item;
+                    } else if (item.success) {
+                        await this.saveScanResultsToFirestore(examTemplate.examId, item.results);
+                        this.emit('scanCompleted', item.results);
+                    } else {
+                        this.emit('scanRejected', item);
+                    }
+                }
+            }
+            
+            this.emit('batchCompleted', summary);
+            return summary;
+        } catch (error) {
+            console.error('Failed to scan batch:', error);
+            this.emit('error', { type: 'batch', error: error.message });
+            throw error;
+        }
+    }
+
     // Session Management
-    async startScanningSession(sessionName, examId) {
+    // Pass { continuous: true, examTemplate } to have the Pi scan every sheet placed under the camera
+    async startScanningSession(sessionName, examId, options = {}) {
         try {
             const response = await this.makeRequest('/api/session/start', {
                 method: 'POST',
                 body: JSON.stringify({
                     session_name: sessionName,
-                    exam_id: examId
+                    exam_id: examId,
+                    continuous: !!options.continuous,
+                    exam_template: options.examTemplate
                 })
             });
             
@@ -251,6 +357,10 @@ class RaspberryPiClientFree {
                 // Save session to Firestore
                 await this.saveSessionToFirestore(response.session, 'started');
                 this.emit('sessionStarted', response.session);
+                
+                if (options.continuous) {
+                    this.startSessionResultsPolling(examId);
+                }
             }
             
             return response;
@@ -263,6 +373,8 @@ class RaspberryPiClientFree {
 
     async endScanningSession() {
         try {
+            this.stopSessionResultsPolling();
+            
             const response = await this.makeRequest('/api/session/end', {
                 method: 'POST'
             });
@@ -281,6 +393,72 @@ class RaspberryPiClientFree {
         }
     }
 
+    // Results of continuous scanning, picked up from the Pi as sheets are scanned
+    async getSessionResults(since = 0) {
+        return this.makeRequest(`/api/session/results?since=${since}`);
+    }
+
+    // Results stored on the Pi, newest first. Filters: examId, studentId, sessionId,
+    // since, until; paging: limit and cursor (the previous page's next_cursor);
+    // fields: array of the keys to return
+    async getScanResults(filters = {}) {
+        const params = new URLSearchParams();
+        for (const [key, value] of Object.entries(filters)) {
+            if (value !== undefined && value !== null) {
+                params.set(key, Array.isArray(value) ? value.join(',') : value);
+            }
+        }
+        return this.makeRequest(`/api/scan-results?${params}`);
+    }
+
+    async getMetricsHistory(seconds = null, points = 120) {
+        const params = new URLSearchParams({ points });
+        if (seconds !== null) {
+            params.set('seconds', seconds);
+        }
+        return this.makeRequest(`/api/metrics/history?${params}`);
+    }
+
+    async getStageMetrics() {
+        return this.makeRequest('/api/metrics/stages');
+    }
+
+    startSessionResultsPolling(examId, interval = 2000) {
+        this.stopSessionResultsPolling();
+        
+        // Results arrive as scan_result events on the live stream when it is available
+        if (this.connectEvents()) {
+            this.sessionExamId = examId;
+            return;
+        }
+        
+        this.sessionResultsIndex = 0;
+        this.sessionResultsInterval = setInterval(async () => {
+            try {
+                const response = await this.getSessionResults(this.sessionResultsIndex);
+                this.sessionResultsIndex = response.next;
+                
+                for (const results of response.results) {
+                    await this.saveScanResultsToFirestore(examId, results);
+                    this.emit('scanCompleted', results);
+                }
+            } catch (error) {
+                console.warn('Failed to get session results:', error);
+            }
+        }, interval);
+    }
+
+    stopSessionResultsPolling() {
+        this.sessionExamId = null;
+        if (!this.isPolling) {
+            this.disconnectEvents();
+        }
+        if (this.sessionResultsInterval) {
+            clearInterval(this.sessionResultsInterval);
+            this.sessionResultsInterval = null;
+        }
+    }
+
     // Calibration
     async calibrateScanner() {
         try {
@@ -404,13 +582,78 @@ class RaspberryPiClientFree {
         }
     }
 
-    // Status Polling
+    // Live updates: one Server-Sent Events stream carries status changes,
+    // session start/end and every scan result. Returns false if unsupported.
+    connectEvents() {
+        if (this.eventSource) {
+            return true;
+        }
+        if (typeof EventSource === 'undefined') {
+            return false;
+        }
+        
+        this.eventSource = new EventSource(`${this.raspberryPiUrl}/api/events`);
+        
+        this.eventSource.addEventListener('status', (event) => {
+            // The first status is complete, later ones only carry the fields that changed
+            const { status, partial } = JSON.parse(event.data);
+            this.status = partial ? mergeStatus(this.status || {}, status) : status;
+            // Only shown locally; writing every pushed change to Firestore would
+            // cost a write per open tab per status change
+            this.emit('statusUpdate', this.status);
+        });
+        
+        this.eventSource.addEventListener('session_started', (event) => {
+            this.emit('piSessionStarted', JSON.parse(event.data));
+        });
+        
+        this.eventSource.addEventListener('session_ended', (event) => {
+            this.emit('piSessionEnded', JSON.parse(event.data));
+        });
+        
+        this.eventSource.addEventListener('scan_result', async (event) => {
+            const data = JSON.parse(event.data);
+            this.emit('scanResult', data);
+            
+            // Sheets scanned hands-free are saved by the client that started the session
+            if (data.source === 'continuous' && this.sessionExamId) {
+                try {
+                    await this.saveScanResultsToFirestore(this.sessionExamId, data.results);
+                    this.emit('scanCompleted', data.results);
+                } catch (error) {
+                    console.warn('Failed to save session result:', error);
+                }
+            }
+        });
+        
+        // EventSource reconnects by itself and the Pi replays what was missed
+        this.eventSource.onerror = () => {
+            this.emit('error', { type: 'events', error: 'Event stream interrupted' });
+        };
+        
+        console.log('Connected to the Raspberry Pi event stream');
+        return true;
+    }
+    
+    disconnectEvents() {
+        if (this.eventSource) {
+            this.eventSource.close();
+            this.eventSource = null;
+            console.log('Disconnected from the Raspberry Pi event stream');
+        }
+    }
+
+    // Status Polling (uses the event stream when the browser supports it)
     startStatusPolling(interval = 5000) {
         if (this.isPolling) {
             this.stopStatusPolling();
         }
         
         this.isPolling = true;
+        if (this.connectEvents()) {
+            return;
+        }
+        
         this.statusPollingInterval = setInterval(async () => {
             try {
                 await this.getRaspberryPiStatus();
@@ -423,6 +666,10 @@ class RaspberryPiClientFree {
     }
 
     stopStatusPolling() {
+        if (!this.sessionExamId) {
+            this.disconnectEvents();
+        }
+        this.isPolling = false;
         if (this.statusPollingInterval) {
             clearInterval(this.statusPollingInterval);
             this.statusPollingInterval = null;
@@ -458,11 +705,32 @@ class RaspberryPiClientFree {
     // Cleanup
     destroy() {
         this.stopStatusPolling();
+        this.stopSessionResultsPolling();
+        this.disconnectEvents();
+        if (this.previewUrl) {
+            URL.revokeObjectURL(this.previewUrl);
+            this.previewUrl = null;
+        }
         this.eventListeners = {};
         console.log('Raspberry Pi client destroyed');
     }
 }
 
+// Apply a partial status from the event stream to the last known status
+function mergeStatus(base, changes) {
+    const merged = { ...base };
+    for (const [key, value] of Object.entries(changes)) {
+        const current = merged[key];
+        if (value && typeof value === 'object' && !Array.isArray(value) &&
+            current && typeof current === 'object' && !Array.isArray(current)) {
+            merged[key] = mergeStatus(current, value);
+        } else {
+            merged[key] = value;
+        }
+    }
+    return merged;
+}
+
 // Export for use in other modules
 if (typeof window !== 'undefined') {
     window.RaspberryPiClientFree = RaspberryPiClientFree;
@@ -8,20 +8,43 @@ This API runs on the Raspberry Pi and handles:
 - Hardware status monitoring
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
-import cv2
-import numpy as np
 import json
 import os
+import socket
 import time
 import threading
-import requests
+import uuid
 from datetime import datetime
 import base64
 from io import BytesIO
-from PIL import Image
 import logging
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError, as_completed
+
+import http_client
+from lazy_import import LazyModule
+from sync_queue import SyncQueue
+from status_publisher import StatusPublisher
+from event_broadcaster import EventBroadcaster
+from template_store import TemplateStore
+import result_store
+from preview_stream import PreviewStream, encode_jpeg, BOUNDARY as PREVIEW_BOUNDARY
+from metrics_sampler import MetricsSampler
+from scan_timing import StageTimer, StageStats
+import prometheus_metrics
+from api_auth import require_auth, token_verifications
+from scan_profiler import ScanProfiler
+
+# OpenCV, NumPy and the OMR engine load on first use (or in the warm-up after start-up),
+# so the server starts answering before they are read off the SD card
+cv2 = LazyModule('cv2')
+np = LazyModule('numpy')
+omr_engine = LazyModule('omr_engine')
+scan_workers = LazyModule('scan_workers')
+frame_quality = LazyModule('frame_quality')
+camera_grabber = LazyModule('camera_grabber')
+continuous_scan = LazyModule('continuous_scan')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -34,17 +57,115 @@ CORS(app)  # Enable CORS for all routes
 FIREBASE_PROJECT_ID = "rosec-57d1d"
 FIREBASE_API_URL = f"https://us-central1-{FIREBASE_PROJECT_ID}.cloudfunctions.net/raspberryPiAPI"
 
+# Port the API listens on
+API_PORT = int(os.environ.get('API_PORT', 5000))
+
+# Answer sheet processing runs in this many worker processes (0 processes inline
+# in the request thread); defaults to one worker per CPU core
+SCAN_WORKERS = int(os.environ.get('SCAN_WORKERS', os.cpu_count() or 1))
+SCAN_JOB_TIMEOUT = float(os.environ.get('SCAN_JOB_TIMEOUT', 10))
+
+# How long /api/scan waits for a frame that passes the quality gate
+QUALITY_WAIT = float(os.environ.get('QUALITY_WAIT', 1.0))
+
+# Largest number of sheets /api/scan/batch accepts in one request
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 200))
+
+# Scan results wait in this SQLite database until Firebase has accepted them
+SYNC_QUEUE_PATH = os.environ.get('SYNC_QUEUE_PATH',
+                                 os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sync_queue.db'))
+
+# Queued results are sent in batches once any of these limits is reached
+SYNC_BATCH_SIZE = int(os.environ.get('SYNC_BATCH_SIZE', 20))
+SYNC_BATCH_BYTES = int(os.environ.get('SYNC_BATCH_BYTES', 8 * 1024 * 1024))
+SYNC_BATCH_WAIT_MS = int(os.environ.get('SYNC_BATCH_WAIT_MS', 500))
+
+# Sheet images travel separately from the answer records, after them:
+# 'background' uploads them right away under the bandwidth cap, 'idle' once no sheet
+# has been scanned for IMAGE_SYNC_IDLE_SECONDS, 'session_end' once no session is running
+IMAGE_SYNC_MODE = os.environ.get('IMAGE_SYNC_MODE', 'idle')
+IMAGE_SYNC_BANDWIDTH_KBPS = float(os.environ.get('IMAGE_SYNC_BANDWIDTH_KBPS', 256))
+IMAGE_SYNC_IDLE_SECONDS = float(os.environ.get('IMAGE_SYNC_IDLE_SECONDS', 10))
+
+# How scan images travel to Firebase: 'multipart' sends the raw JPEG bytes as file
+# parts, 'json' embeds them as base64 in the JSON body like earlier versions did
+SYNC_TRANSPORT = os.environ.get('SYNC_TRANSPORT', 'multipart')
+
+# Exam templates are cached on disk here, so scans can send only an examId and keep
+# working offline. They are fetched from TEMPLATE_SOURCE_URL (a server with
+# /api/exam/<exam_id>, e.g. mock_pi_api.py) or from Firestore with a service account key
+TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR',
+                                    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exam_templates'))
+TEMPLATE_SOURCE_URL = os.environ.get('TEMPLATE_SOURCE_URL')
+TEMPLATE_FIRESTORE_KEY = os.environ.get('TEMPLATE_FIRESTORE_KEY')
+TEMPLATE_MAX_AGE = float(os.environ.get('TEMPLATE_MAX_AGE', 300))
+
+# Every scanned sheet is recorded in this SQLite database for /api/scan-results
+RESULT_STORE_PATH = os.environ.get('RESULT_STORE_PATH',
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scan_results.db'))
+
+# Seconds between status heartbeats to Firebase when nothing has changed
+STATUS_HEARTBEAT_INTERVAL = float(os.environ.get('STATUS_HEARTBEAT_INTERVAL', 30))
+
+# Status pushes to Firebase carry the whole status document, as earlier versions
+# did; set STATUS_PUSH_PARTIAL=1 to send only the changed fields once the deployed
+# raspberryPiAPI function merges partial updates
+STATUS_PUSH_PARTIAL = os.environ.get('STATUS_PUSH_PARTIAL', '0').lower() in ('1', 'true', 'yes')
+
+# Smallest change in each system reading that is pushed before the next heartbeat.
+# Scan counters change with every sheet, so they only ride along with the heartbeat
+# or another push; scannerReady and session start/end are pushed right away
+STATUS_TOLERANCES = {
+    ('scanCount',): float('inf'),
+    ('currentSession', 'scan_count'): float('inf'),
+    ('systemInfo', 'cpuUsage'): 20.0,
+    ('systemInfo', 'memoryUsage'): 5.0,
+    ('systemInfo', 'temperature'): 3.0
+}
+
+# Same for the status pushed to /api/events clients
+EVENT_STATUS_TOLERANCES = {
+    ('system_info', 'cpu_usage'): 20.0,
+    ('system_info', 'memory_usage'): 5.0,
+    ('system_info', 'cpu_temperature'): 3.0,
+    ('system_info', 'camera_fps'): 2.0,
+    ('sync_queue', 'oldest_age'): 60.0,
+    ('image_queue', 'oldest_age'): 60.0
+}
+
+# JPEG quality of /api/preview images unless the request asks for another
+PREVIEW_QUALITY = int(os.environ.get('PREVIEW_QUALITY', 80))
+
+# Resolution, quality and frame rate cap of the live /api/preview/stream
+PREVIEW_STREAM_WIDTH = int(os.environ.get('PREVIEW_STREAM_WIDTH', 640))
+PREVIEW_STREAM_QUALITY = int(os.environ.get('PREVIEW_STREAM_QUALITY', 70))
+PREVIEW_STREAM_FPS = float(os.environ.get('PREVIEW_STREAM_FPS', 15))
+
+# CPU, memory, temperature and camera FPS are sampled every METRICS_INTERVAL seconds;
+# the last METRICS_HISTORY samples are kept for /api/metrics/history
+METRICS_INTERVAL = float(os.environ.get('METRICS_INTERVAL', 2))
+METRICS_HISTORY = int(os.environ.get('METRICS_HISTORY', 1800))
+
+# Per-stage scan timing percentiles cover this many recent scans
+SCAN_TIMING_WINDOW = int(os.environ.get('SCAN_TIMING_WINDOW', 500))
+
 class AnswerSheetScanner:
     def __init__(self):
         self.camera = None
+        self.grabber = None
         self.scanning_active = False
         self.current_session = None
+        self.session_results = []
+        self.sheet_watcher = None
         self.scan_count = 0
         self.last_scan_time = None
+        self.last_alignment = None
         
     def initialize_camera(self):
-        """Initialize the camera"""
+        """Initialize the camera and start the background frame grabber"""
         try:
+            self.release_camera()
+            
             self.camera = cv2.VideoCapture(0)  # Use default camera
             if not self.camera.isOpened():
                 logger.error("Failed to open camera")
@@ -55,6 +176,12 @@ class AnswerSheetScanner:
             self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
             self.camera.set(cv2.CAP_PROP_FPS, 30)
             
+            # Drain the camera continuously so requests never wait on a read
+            self.grabber = camera_grabber.CameraGrabber(self.camera)
+            self.grabber.start()
+            if self.sheet_watcher:
+                self.sheet_watcher.grabber = self.grabber
+            
             logger.info("Camera initialized successfully")
             return True
         except Exception as e:
@@ -62,113 +189,255 @@ class AnswerSheetScanner:
             return False
     
     def capture_image(self):
-        """Capture an image from the camera"""
-        if not self.camera or not self.camera.isOpened():
+        """Return the freshest frame from the background grabber"""
+        if not self.camera or not self.camera.isOpened() or self.grabber is None:
             if not self.initialize_camera():
                 return None
         
         try:
-            ret, frame = self.camera.read()
-            if ret:
-                return frame
-            else:
+            frame = self.grabber.fresh_frame()
+            if frame is None:
                 logger.error("Failed to capture image")
-                return None
+            return frame
         except Exception as e:
             logger.error(f"Image capture error: {e}")
             return None
     
-    def process_answer_sheet(self, image, exam_template):
-        """Process the answer sheet image and extract answers"""
+    def capture_checked_image(self, timeout=QUALITY_WAIT):
+        """Return (frame, quality) for the freshest frame passing the quality gate.
+
+        Rejected frames are retried with newer frames until `timeout` runs out;
+        the last rejected frame and its quality are returned in that case.
+        """
+        image = self.capture_image()
+        if image is None:
+            return None, None
+        
+        quality = frame_quality.check_frame(image)
+        deadline = time.monotonic() + timeout
+        while not quality['ok'] and self.grabber is not None:
+            latest = self.grabber.latest()
+            remaining = deadline - time.monotonic()
+            entry = self.grabber.wait_for_frame(latest[1] if latest else 0, remaining) if remaining > 0 else None
+            if entry is None:
+                break
+            image = entry[2]
+            quality = frame_quality.check_frame(image)
+        
+        return image, quality
+    
+    def process_answer_sheet(self, image, exam_template, timer=None):
+        """Process the answer sheet image and extract answers
+        
+        The processing stages are added to `timer` when one is given. Raises
+        scan_workers.SheetNotFound when the sheet's corner markers are not in view.
+        """
         try:
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Apply Gaussian blur to reduce noise
-            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+            start = time.perf_counter()
+            compiled = omr_engine.template_cache.get(exam_template)
             
-            # Apply threshold to get binary image
-            _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            
-            # Find contours
-            contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            # Hand the frame to a worker process when the pool is running
+            if scan_pool is not None:
+                results, alignment = scan_pool.process(image, compiled, self.last_alignment)
+            else:
+                results, alignment = scan_workers.process_frame(image, compiled, self.last_alignment)
+            elapsed = time.perf_counter() - start
             
-            # Mock answer extraction (replace with actual OCR/bubble detection)
-            answers = self.extract_mock_answers(exam_template)
+            # Keep the homography so the next frame can skip marker detection
+            self.last_alignment = alignment
             
-            # Extract student ID (mock implementation)
-            student_id = self.extract_student_id(thresh)
+            timings = results.pop('timings', {})
+            if timer is not None:
+                timer.update(timings)
+                if scan_pool is not None:
+                    # Time spent getting the frame to a worker and the results back
+                    timer.add('dispatch', max(0.0, elapsed - sum(timings.values()) / 1000.0))
             
-            return {
-                'student_id': student_id,
-                'answers': answers,
-                'confidence': 0.95,
-                'processing_time': time.time() - self.last_scan_time if self.last_scan_time else 0
-            }
+            results['processing_time'] = round(elapsed, 4)
+            return results
             
+        except scan_workers.SheetNotFound:
+            raise
+        except FutureTimeoutError:
+            logger.error(f"Answer sheet processing timed out after {SCAN_JOB_TIMEOUT}s")
+            return None
         except Exception as e:
             logger.error(f"Answer sheet processing error: {e}")
             return None
     
-    def extract_mock_answers(self, exam_template):
-        """Mock answer extraction - replace with actual bubble detection"""
-        total_questions = exam_template.get('totalQuestions', 25)
-        choices = ['A', 'B', 'C', 'D']
+    def release_camera(self):
+        """Stop the frame grabber and release the camera"""
+        if self.grabber:
+            self.grabber.stop()
+            self.grabber = None
+        if self.camera:
+            self.camera.release()
+            self.camera = None
+    
+    def start_continuous(self, exam_template):
+        """Scan every sheet placed under the camera without a /api/scan call"""
+        self.stop_continuous()
+        if not self.camera or not self.camera.isOpened() or self.grabber is None:
+            if not self.initialize_camera():
+                return False
         
-        answers = {}
-        for i in range(1, total_questions + 1):
-            # Mock random answer selection
-            answers[str(i)] = choices[np.random.randint(0, len(choices))]
+        def on_sheet(frame):
+            # A rejected frame keeps the watcher waiting for a better one of the same sheet
+            quality = frame_quality.check_frame(frame)
+            if not quality['ok']:
+                logger.info(f"Continuous scan frame rejected: {quality['reason']}")
+                return False
+            
+            self.last_scan_time = time.time()
+            timer = StageTimer()
+            try:
+                results = self.process_answer_sheet(frame, exam_template, timer)
+            except scan_workers.SheetNotFound:
+                logger.info("Continuous scan frame rejected: no_markers")
+                return False
+            if results is not None:
+                results['quality'] = quality
+                save_scan_results(frame, results, exam_template, source='continuous', timer=timer)
+            return True
         
-        return answers
+        self.sheet_watcher = continuous_scan.SheetWatcher(self.grabber, on_sheet)
+        self.sheet_watcher.start()
+        return True
     
-    def extract_student_id(self, image):
-        """Mock student ID extraction - replace with actual OCR"""
-        # Generate a mock student ID
-        return f"2024{np.random.randint(1000, 9999)}"
+    def stop_continuous(self):
+        """Stop hands-free scanning"""
+        if self.sheet_watcher:
+            self.sheet_watcher.stop()
+            self.sheet_watcher = None
     
     def cleanup(self):
         """Clean up camera resources"""
+        self.stop_continuous()
         if self.camera:
-            self.camera.release()
+            self.release_camera()
             cv2.destroyAllWindows()
 
 # Global scanner instance
 scanner = AnswerSheetScanner()
 
+# Worker pool for answer sheet processing (started in __main__)
+scan_pool = None
+
+# Outbound queues for Firebase: answer records and, separately, sheet images (opened in __main__)
+sync_queue = None
+image_queue = None
+
+# Publisher of status changes to Firebase (started in __main__)
+status_publisher = None
+
+# Exam templates available by examId (the cache directory is created on first save)
+template_store = TemplateStore(TEMPLATE_CACHE_DIR, TEMPLATE_SOURCE_URL, TEMPLATE_FIRESTORE_KEY, TEMPLATE_MAX_AGE)
+
+# Local record of every scanned sheet (the database is opened on first use)
+scan_results = result_store.ScanResultStore(RESULT_STORE_PATH)
+
+# Live preview encoder shared by every /api/preview/stream viewer
+preview_stream = PreviewStream(lambda: scanner.grabber, PREVIEW_STREAM_WIDTH,
+                               PREVIEW_STREAM_QUALITY, PREVIEW_STREAM_FPS)
+
+# Rolling per-stage timings of recent scans
+scan_stages = StageStats(SCAN_TIMING_WINDOW)
+
+# On-demand profiler for /api/scan and the whole process (see /api/debug/profile)
+profiler = ScanProfiler()
+
+# Prometheus metrics at /metrics. Queue and camera readings are only taken when scraped
+prometheus = prometheus_metrics.instrument(app, prometheus_metrics.Registry())
+prometheus.register(token_verifications)
+scans_total = prometheus.counter('rosec_scans_total', 'Answer sheets scanned', ('source',))
+scan_stage_seconds = prometheus.histogram('rosec_scan_stage_duration_seconds',
+                                          'Time scans spent in each pipeline stage', ('stage',))
+prometheus.callback('rosec_sync_queue_depth', 'Items waiting to be synced to Firebase',
+                    lambda: {(queue.kind,): queue.depth() for queue in (sync_queue, image_queue)
+                             if queue is not None}, labelnames=('kind',))
+prometheus.callback('rosec_sync_failures_total', 'Items Firebase failed to accept',
+                    lambda: {(queue.kind,): queue.failures for queue in (sync_queue, image_queue)
+                             if queue is not None}, kind='counter', labelnames=('kind',))
+prometheus.callback('rosec_camera_read_failures_total', 'Camera frames that failed to read',
+                    lambda: scanner.grabber.read_failures if scanner.grabber is not None else None,
+                    kind='counter')
+
+# Event stream shared by every /api/events client, and the status producer feeding it
+events = EventBroadcaster()
+event_status_publisher = None
+
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Get Raspberry Pi status"""
     try:
-        # Get system information
-        cpu_temp = get_cpu_temperature()
-        cpu_usage = get_cpu_usage()
-        memory_usage = get_memory_usage()
-        
-        status = {
-            'online': True,
-            'timestamp': datetime.now().isoformat(),
-            'scanner_ready': scanner.camera is not None,
-            'scanning_active': scanner.scanning_active,
-            'current_session': scanner.current_session,
-            'scan_count': scanner.scan_count,
-            'system_info': {
-                'cpu_temperature': cpu_temp,
-                'cpu_usage': cpu_usage,
-                'memory_usage': memory_usage
-            }
-        }
+        status = collect_status()
+        status['timestamp'] = datetime.now().isoformat()
         
         return jsonify({'success': True, 'status': status})
     except Exception as e:
         logger.error(f"Status error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def collect_status(details=True):
+    """Scanner status as reported by /api/status and the event stream.
+    
+    System readings come from the latest metrics sample, so this never waits
+    on the CPU measurement. `details` adds the template cache, HTTP and publisher counters, which
+    change too often to be worth pushing to event stream clients.
+    """
+    status = {
+        'online': True,
+        'scanner_ready': scanner.camera is not None,
+        'scanning_active': scanner.scanning_active,
+        'current_session': scanner.current_session,
+        'scan_count': scanner.scan_count,
+        'continuous_scanning': scanner.sheet_watcher is not None,
+        'sync_queue': sync_queue.stats() if sync_queue is not None else None,
+        'image_queue': image_queue.stats() if image_queue is not None else None,
+        'system_info': system_info()
+    }
+    if details:
+        status['template_cache'] = omr_engine.template_cache.stats() if omr_engine.loaded else None
+        status['template_store'] = template_store.stats()
+        status['http'] = http_client.stats()
+        status['status_publisher'] = status_publisher.stats() if status_publisher is not None else None
+        status['preview_stream'] = preview_stream.stats()
+        status['event_stream'] = {'subscribers': events.subscribers, 'published': events.published,
+                                  'dropped': events.dropped}
+    return status
+
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    """Server-Sent Events stream of status changes, session start/end and scan results.
+    
+    Every client gets the full status first; 'status' events after that only
+    carry the fields that changed. Reconnecting clients (Last-Event-ID) are
+    sent the events they missed.
+    """
+    try:
+        last_event_id = request.headers.get('Last-Event-ID', type=int)
+        subscriber = events.subscribe(last_event_id)
+        first = [('status', {'status': collect_status(details=False), 'partial': False})]
+        
+        return Response(stream_with_context(events.stream(subscriber, first)),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        
+    except Exception as e:
+        logger.error(f"Event stream error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def publish_status_event(fields, full):
+    """Broadcast changed status fields to event stream clients"""
+    events.publish('status', {'status': fields, 'partial': not full})
+    return True
+
 @app.route('/api/initialize', methods=['POST'])
 def initialize_scanner():
     """Initialize the scanner"""
     try:
         success = scanner.initialize_camera()
+        publish_status_change()
         if success:
             return jsonify({'success': True, 'message': 'Scanner initialized successfully'})
         else:
@@ -178,100 +447,509 @@ def initialize_scanner():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/scan', methods=['POST'])
+@profiler.wrap
 def scan_answer_sheet():
     """Scan an answer sheet"""
     try:
         data = request.get_json()
-        exam_template = data.get('exam_template', {})
+        exam_template = resolve_exam_template(data.get('exam_template'), data.get('examId') or data.get('exam_id'))
+        if exam_template is None:
+            return jsonify({'success': False, 'error': 'Exam template not available'}), 404
         
-        # Capture image
+        # Capture image; the capture stage includes waiting for a frame that passes the quality gate
         scanner.last_scan_time = time.time()
-        image = scanner.capture_image()
+        timer = StageTimer()
+        with timer.stage('capture'):
+            if data.get('quality_check', True):
+                image, quality = scanner.capture_checked_image()
+            else:
+                image, quality = scanner.capture_image(), None
         
         if image is None:
             return jsonify({'success': False, 'error': 'Failed to capture image'}), 500
         
-        # Process the answer sheet
-        results = scanner.process_answer_sheet(image, exam_template)
+        # Reject blurry, overexposed or missing sheets before any heavy processing
+        if quality is not None and not quality['ok']:
+            return jsonify({
+                'success': False,
+                'error': f"Frame rejected: {quality['reason']}",
+                'reason': quality['reason'],
+                'quality': quality
+            }), 422
+        
+        # Process the answer sheet; a frame without the corner markers is rejected like a bad frame
+        try:
+            results = scanner.process_answer_sheet(image, exam_template, timer)
+        except scan_workers.SheetNotFound as e:
+            return jsonify({
+                'success': False,
+                'error': f"Frame rejected: {e.reason}",
+                'reason': e.reason,
+                'quality': quality
+            }), 422
         
         if results is None:
             return jsonify({'success': False, 'error': 'Failed to process answer sheet'}), 500
+        results['quality'] = quality
+        
+        sync_status = save_scan_results(image, results, exam_template, timer=timer)
         
-        # Convert image to base64 for storage/transmission
-        _, buffer = cv2.imencode('.jpg', image)
-        image_base64 = base64.b64encode(buffer).decode('utf-8')
-        
-        # Update scan count
-        scanner.scan_count += 1
-        
-        # Send results to Firebase
-        firebase_data = {
-            'action': 'save_scan_results',
-            'data': {
-                'examId': exam_template.get('examId'),
-                'results': [results],
-                'image_data': image_base64,
-                'timestamp': datetime.now().isoformat()
-            }
+        return jsonify({
+            'success': True,
+            'results': results,
+            'firebase_synced': sync_status == 'synced',
+            'sync_status': sync_status,
+            'scan_count': scanner.scan_count,
+            'timings': timer.as_dict()
+        })
+        
+    except Exception as e:
+        logger.error(f"Scan error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def save_scan_results(image, results, exam_template, encoded=None, source='scan', timer=None):
+    """Count a processed sheet, add it to the session and queue it for Firebase.
+    
+    `encoded` is the sheet's JPEG when it is already available, e.g. for uploads.
+    `source` ('scan', 'batch' or 'continuous') is passed on to event stream clients.
+    The encode, persistence and sync stages are added to `timer`, whose stages
+    are then recorded in the rolling scan timings.
+    Returns the sync status: 'queued', or 'synced'/'failed' when the queue is not
+    running and the results are sent directly.
+    """
+    timer = timer or StageTimer()
+    
+    # The JPEG is kept as raw bytes; it is only base64-encoded if the json transport sends it
+    with timer.stage('encode'):
+        if encoded is None:
+            _, encoded = cv2.imencode('.jpg', image)
+        image_bytes = encoded.tobytes() if isinstance(encoded, np.ndarray) else bytes(encoded)
+    
+    # Update scan count; every saved sheet, batch ones included, counts as scanner
+    # activity that holds back idle-mode image uploads
+    scanner.scan_count += 1
+    scanner.last_scan_time = time.time()
+    if scanner.current_session:
+        scanner.current_session['scan_count'] = scanner.scan_count
+        scanner.session_results.append(results)
+    # Only /api/events clients see the new count at once; Firebase gets it with the heartbeat
+    if event_status_publisher is not None:
+        event_status_publisher.notify()
+    
+    # Keep a local record for review on the Pi, online or not
+    timestamp = datetime.now().isoformat()
+    with timer.stage('persist'):
+        result_id = scan_results.add(results, exam_template.get('examId'), results.get('student_id'),
+                                     (scanner.current_session or {}).get('id'), timestamp)
+    
+    # Send results to Firebase; scanId ties the answer record to its image upload
+    scan_id = uuid.uuid4().hex
+    firebase_data = {
+        'action': 'save_scan_results',
+        'data': {
+            'scanId': scan_id,
+            'examId': exam_template.get('examId'),
+            'results': [results],
+            'timestamp': timestamp
         }
+    }
+    
+    # The background senders deliver queued records, retrying until Firebase accepts them.
+    # The small answer record goes out at once; the image follows when bandwidth allows
+    with timer.stage('sync'):
+        if sync_queue is not None and image_queue is not None:
+            sync_queue.enqueue(firebase_data)
+            image_queue.enqueue({
+                'action': 'save_scan_image',
+                'data': {
+                    'scanId': scan_id,
+                    'examId': exam_template.get('examId'),
+                    'studentId': results.get('student_id'),
+                    'timestamp': timestamp
+                }
+            }, image_bytes)
+            sync_status = 'queued'
+        else:
+            try:
+                sync_status = 'synced' if send_to_firebase(firebase_data, image_bytes) else 'failed'
+            except Exception as e:
+                logger.warning(f"Firebase sync error: {e}")
+                sync_status = 'failed'
+    scan_stages.record(timer)
+    scans_total.inc(source=source)
+    for stage, ms in timer.timings.items():
+        scan_stage_seconds.observe(ms / 1000.0, stage=stage)
+    
+    events.publish('scan_result', {
+        'id': result_id,
+        'source': source,
+        'exam_id': exam_template.get('examId'),
+        'results': results,
+        'sync_status': sync_status,
+        'scan_count': scanner.scan_count
+    })
+    return sync_status
+
+def send_to_firebase(payload, image=None):
+    """Post a payload and its JPEG to the Firebase API. Returns True when it was accepted"""
+    files = []
+    data = attach_image(dict(payload['data']), image, 'image', files)
+    response = post_to_firebase(payload['action'], data, files, timeout=10)
+    return response.status_code == 200
+
+def send_batch_to_firebase(batch):
+    """Post queued save_scan_results payloads in batches. Returns the acknowledged queue ids.
+    
+    Queued records are sent through save_scan_results' 'results' list, one request
+    per exam. Each result carries its scanId, timestamp and queue id ('itemId'); the
+    server lists the items it stored in 'acknowledged'. A 200 response without the
+    list comes from a server that stores the whole request, so every item in it is
+    acknowledged. Items of a request that failed stay queued and are retried.
+    """
+    exams = {}
+    for item_id, payload, image in batch:
+        exams.setdefault(payload['data'].get('examId'), []).append((item_id, payload, image))
+    
+    acknowledged = []
+    for exam_id, items in exams.items():
+        files = []
+        results = []
+        for item_id, payload, image in items:
+            data = payload['data']
+            for result in data['results']:
+                entry = dict(result, scanId=data.get('scanId'), timestamp=data.get('timestamp'), itemId=item_id)
+                results.append(attach_image(entry, image, f'image_{item_id}', files))
+        
+        response = post_to_firebase('save_scan_results', {
+            'examId': exam_id,
+            'results': results,
+            'timestamp': datetime.now().isoformat()
+        }, files, timeout=30)
+        if response.status_code != 200:
+            continue
         
-        # Send to Firebase (optional - can be done asynchronously)
         try:
-            response = requests.post(FIREBASE_API_URL, json=firebase_data, timeout=10)
-            firebase_success = response.status_code == 200
+            body = response.json()
+        except ValueError:
+            body = None
+        listed = body.get('acknowledged') if isinstance(body, dict) else None
+        sent = {str(item_id): item_id for item_id, _, _ in items}
+        if not isinstance(listed, list):
+            acknowledged.extend(sent.values())
+            continue
+        # Ids may come back as strings from JSON-first servers
+        acknowledged.extend(sent[str(item_id)] for item_id in listed if str(item_id) in sent)
+    return acknowledged
+
+def send_images_to_firebase(batch):
+    """Upload queued sheet images one request each. Returns the acknowledged queue ids"""
+    acknowledged = []
+    for item_id, payload, image in batch:
+        if send_to_firebase(payload, image):
+            acknowledged.append(item_id)
+    return acknowledged
+
+def image_sync_ready():
+    """Whether sheet images may be uploaded now, according to IMAGE_SYNC_MODE"""
+    if IMAGE_SYNC_MODE == 'session_end':
+        return scanner.current_session is None
+    if IMAGE_SYNC_MODE == 'idle':
+        return scanner.last_scan_time is None or time.time() - scanner.last_scan_time >= IMAGE_SYNC_IDLE_SECONDS
+    return True
+
+def attach_image(item, image, field, files):
+    """Attach a JPEG to an outgoing item: as a multipart file part named `field`,
+    or as base64 'image_data' with the json transport"""
+    if image is None:
+        return item
+    if SYNC_TRANSPORT == 'json':
+        item['image_data'] = base64.b64encode(image).decode('utf-8')
+    else:
+        item['image_field'] = field
+        files.append((field, (f'{field}.jpg', image, 'image/jpeg')))
+    return item
+
+def post_to_firebase(action, data, files, timeout):
+    """POST an action to the Firebase API, as multipart form data when there are files"""
+    if files:
+        form = {'action': action, 'data': json.dumps(data)}
+        return http_client.post(FIREBASE_API_URL, data=form, files=files, timeout=timeout)
+    return http_client.post(FIREBASE_API_URL, json={'action': action, 'data': data}, timeout=timeout)
+
+@app.route('/api/scan/batch', methods=['POST'])
+def scan_batch():
+    """Scan many sheets in one request: uploaded images, or `count` captured frames.
+    
+    Uploads are multipart 'images' files with the template as a JSON 'exam_template'
+    form field. Uploads already cropped to the sheet may be read without corner
+    markers by sending 'allow_unaligned' = true; otherwise a sheet whose markers
+    are not found is rejected with reason 'no_markers'. Results stream back as
+    one JSON line per sheet, in completion order, followed by a summary line.
+    """
+    try:
+        if request.files:
+            exam_template = json.loads(request.form.get('exam_template') or '{}')
+            exam_id = request.form.get('examId') or request.form.get('exam_id')
+            allow_unaligned = request.form.get('allow_unaligned', '').lower() in ('1', 'true', 'yes')
+            uploads = request.files.getlist('images')
+            jobs = [(upload.filename, upload.read()) for upload in uploads]
+            count = len(jobs)
+        else:
+            data = request.get_json() or {}
+            exam_template = data.get('exam_template', {})
+            exam_id = data.get('examId') or data.get('exam_id')
+            count = int(data.get('count', 1))
+            jobs = None
+        
+        exam_template = resolve_exam_template(exam_template, exam_id)
+        if exam_template is None:
+            return jsonify({'success': False, 'error': 'Exam template not available'}), 404
+        
+        if count < 1:
+            return jsonify({'success': False, 'error': 'No images to scan'}), 400
+        if count > MAX_BATCH_SIZE:
+            return jsonify({'success': False, 'error': f'Batch is limited to {MAX_BATCH_SIZE} sheets'}), 400
+        
+        compiled = omr_engine.template_cache.get(exam_template)
+        
+    except Exception as e:
+        logger.error(f"Batch scan error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+    
+    def queue_sheets():
+        """Yield (future, index, filename, data, image, quality, timer) per sheet.
+        
+        Without the worker pool each sheet is read inline when it is reached, so
+        a caller streaming as it goes sends every result as soon as it is ready.
+        """
+        if jobs is not None:
+            for index, (filename, data) in enumerate(jobs):
+                if scan_pool is not None:
+                    future = scan_pool.submit_encoded(data, compiled, allow_unaligned)
+                else:
+                    future = completed_future(scan_workers.process_encoded, data, compiled, allow_unaligned)
+                yield future, index, filename, data, None, None, StageTimer()
+        else:
+            for index in range(count):
+                timer = StageTimer()
+                with timer.stage('capture'):
+                    image, quality = scanner.capture_checked_image()
+                if image is None or not quality['ok']:
+                    future = completed_future(lambda: (None, None))
+                elif scan_pool is not None:
+                    future = scan_pool.submit(image, compiled, scanner.last_alignment)
+                else:
+                    future = completed_future(scan_workers.process_frame, image, compiled, scanner.last_alignment)
+                yield future, index, None, None, image, quality, timer
+                
+                # The next sheet needs a frame of its own
+                latest = scanner.grabber.latest() if scanner.grabber else None
+                if latest and index + 1 < count:
+                    scanner.grabber.wait_for_frame(latest[1])
+    
+    def report(future, index, filename, data, image, quality, timer):
+        """The result line for a finished sheet"""
+        item = {'index': index, 'filename': filename}
+        try:
+            results, extra = future.result(timeout=0)
+            if data is not None:
+                # Uploads come back with the quality measured in the worker
+                quality = extra
+            elif results is not None:
+                # Captured frames come back with their alignment
+                scanner.last_alignment = extra
+                results['quality'] = quality
+            if results is not None:
+                timer.update(results.pop('timings', None))
+            
+            if results is None:
+                item.update({
+                    'success': False,
+                    'error': 'Frame rejected' if quality else 'Failed to capture image',
+                    'reason': quality['reason'] if quality else None,
+                    'quality': quality
+                })
+            else:
+                sync_status = save_scan_results(image, results, exam_template, data, source='batch', timer=timer)
+                item.update({
+                    'success': True,
+                    'results': results,
+                    'sync_status': sync_status,
+                    'timings': timer.as_dict()
+                })
+        except scan_workers.SheetNotFound as e:
+            item.update({'success': False, 'error': 'Frame rejected', 'reason': e.reason, 'quality': quality})
         except Exception as e:
-            logger.warning(f"Firebase sync error: {e}")
-            firebase_success = False
+            logger.error(f"Batch scan item {index} error: {e}")
+            item.update({'success': False, 'error': str(e)})
+        return item
+    
+    def generate():
+        items = []
+        if scan_pool is None:
+            for sheet in queue_sheets():
+                items.append(report(*sheet))
+                yield json.dumps(items[-1]) + '\n'
+        else:
+            # Queue every sheet first so the workers run in parallel while results stream out
+            pending = {sheet[0]: sheet for sheet in queue_sheets()}
+            
+            # Each wave of sheets across the workers gets the job timeout
+            waves = -(-len(pending) // scan_pool.workers)
+            try:
+                for future in as_completed(pending, timeout=SCAN_JOB_TIMEOUT * waves):
+                    items.append(report(*pending.pop(future)))
+                    yield json.dumps(items[-1]) + '\n'
+            except FutureTimeoutError:
+                logger.error(f"Batch scan timed out with {len(pending)} sheets unfinished")
+            
+            # Whatever is still unfinished past the deadline is reported as timed out
+            for future, sheet in pending.items():
+                if future.done():
+                    items.append(report(*sheet))
+                else:
+                    future.cancel()
+                    items.append({
+                        'index': sheet[1],
+                        'filename': sheet[2],
+                        'success': False,
+                        'error': f'Timed out after {SCAN_JOB_TIMEOUT * waves:g}s',
+                        'reason': 'timeout'
+                    })
+                yield json.dumps(items[-1]) + '\n'
+        
+        processed = sum(1 for item in items if item['success'])
+        yield json.dumps({
+            'done': True,
+            'processed': processed,
+            'failed': len(items) - processed,
+            'scan_count': scanner.scan_count
+        }) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def resolve_exam_template(exam_template, exam_id=None):
+    """The template to scan with: the one sent with the request, or the stored template
+    when only an examId was sent (or none, during a session for an exam).
+    
+    Returns None when the exam's template is neither cached nor fetchable.
+    """
+    exam_template = exam_template or {}
+    exam_id = exam_id or exam_template.get('examId') or (scanner.current_session or {}).get('exam_id')
+    if exam_id and set(exam_template) <= {'examId'}:
+        return template_store.get(exam_id)
+    return exam_template
+
+def completed_future(fn, *args):
+    """Run `fn` inline and wrap the outcome in a finished Future, for when the worker pool is off"""
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+@app.route('/api/templates/invalidate', methods=['POST'])
+def invalidate_templates():
+    """Drop compiled exam templates and revalidate stored ones on next use"""
+    try:
+        data = request.get_json(silent=True) or {}
+        exam_id = data.get('exam_id')
+        dropped = omr_engine.template_cache.invalidate(exam_id)
+        template_store.expire(exam_id)
         
         return jsonify({
             'success': True,
-            'results': results,
-            'firebase_synced': firebase_success,
-            'scan_count': scanner.scan_count
+            'invalidated': dropped,
+            'exam_id': exam_id
         })
         
     except Exception as e:
-        logger.error(f"Scan error: {e}")
+        logger.error(f"Template invalidation error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/preview', methods=['GET'])
 def get_camera_preview():
-    """Get a preview image from the camera"""
+    """Get a preview image from the camera.
+    
+    Returns the JPEG itself, or the original JSON with a base64 data URL when
+    `format=json` is requested. `width` downscales the frame and `quality` sets
+    the JPEG quality (1-100).
+    """
     try:
         image = scanner.capture_image()
         if image is None:
             return jsonify({'success': False, 'error': 'Failed to capture preview'}), 500
         
-        # Convert to JPEG
-        _, buffer = cv2.imencode('.jpg', image)
-        image_base64 = base64.b64encode(buffer).decode('utf-8')
+        width = request.args.get('width', type=int)
+        quality = request.args.get('quality', PREVIEW_QUALITY, type=int)
+        jpeg = encode_jpeg(image, width, quality)
         
-        return jsonify({
-            'success': True,
-            'image': f"data:image/jpeg;base64,{image_base64}"
-        })
+        if request.args.get('format') == 'json':
+            image_base64 = base64.b64encode(jpeg).decode('utf-8')
+            return jsonify({
+                'success': True,
+                'image': f"data:image/jpeg;base64,{image_base64}"
+            })
+        
+        return Response(jpeg, mimetype='image/jpeg', headers={'Cache-Control': 'no-store'})
         
     except Exception as e:
         logger.error(f"Preview error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/preview/stream', methods=['GET'])
+def stream_camera_preview():
+    """Live MJPEG preview (multipart/x-mixed-replace), shared by every viewer"""
+    try:
+        if scanner.grabber is None and not scanner.initialize_camera():
+            return jsonify({'success': False, 'error': 'Failed to initialize camera'}), 500
+        
+        return Response(preview_stream.stream(),
+                        mimetype=f'multipart/x-mixed-replace; boundary={PREVIEW_BOUNDARY}',
+                        headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'})
+        
+    except Exception as e:
+        logger.error(f"Preview stream error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/session/start', methods=['POST'])
 def start_session():
-    """Start a scanning session"""
+    """Start a scanning session, optionally scanning every placed sheet automatically"""
     try:
         data = request.get_json()
         session_name = data.get('session_name', f"Session_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
         exam_id = data.get('exam_id')
+        continuous = bool(data.get('continuous', False))
+        exam_template = data.get('exam_template')
         
+        # Continuous scanning needs its template now; the others are fetched in the background
+        # so scans keep working if the network drops mid-exam
+        if continuous:
+            exam_template = resolve_exam_template(exam_template, exam_id) if exam_id or exam_template else None
+            if not exam_template:
+                return jsonify({'success': False, 'error': 'exam_template or a known exam_id is required for continuous scanning'}), 400
+        exam_ids = [exam_id] + list(data.get('exam_ids') or [])
+        threading.Thread(target=template_store.prefetch, args=(exam_ids,), daemon=True).start()
+        
+        scanner.stop_continuous()
         scanner.current_session = {
+            'id': uuid.uuid4().hex,
             'name': session_name,
             'exam_id': exam_id,
             'start_time': datetime.now().isoformat(),
+            'continuous': continuous,
             'scan_count': 0
         }
+        scanner.session_results = []
         scanner.scanning_active = True
         scanner.scan_count = 0
         
+        publish_status_change()
+        if continuous and not scanner.start_continuous(exam_template):
+            return jsonify({'success': False, 'error': 'Failed to initialize camera'}), 500
+        events.publish('session_started', scanner.current_session)
+        
         return jsonify({
             'success': True,
             'session': scanner.current_session,
@@ -282,17 +960,61 @@ def start_session():
         logger.error(f"Start session error: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/session/results', methods=['GET'])
+def get_session_results():
+    """Get the results scanned in the current session, starting at index `since`"""
+    try:
+        since = request.args.get('since', 0, type=int)
+        results = scanner.session_results[since:]
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'next': since + len(results),
+            'session': scanner.current_session
+        })
+        
+    except Exception as e:
+        logger.error(f"Session results error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/scan-results', methods=['GET'])
+def get_scan_results():
+    """Scan results stored on the Pi, newest first.
+    
+    Filters: examId, studentId, sessionId, since/until (ISO timestamps).
+    Paging: limit and cursor (the previous page's next_cursor). fields is a
+    comma-separated list of the keys to return for each record.
+    """
+    try:
+        page = scan_results.query(**result_store.query_args(request.args))
+        
+        return jsonify({
+            'success': True,
+            'results': page['results'],
+            'next_cursor': page['next_cursor']
+        })
+        
+    except Exception as e:
+        logger.error(f"Scan results error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/api/session/end', methods=['POST'])
 def end_session():
     """End the current scanning session"""
     try:
         if scanner.current_session:
+            scanner.stop_continuous()
             scanner.current_session['end_time'] = datetime.now().isoformat()
             scanner.current_session['final_scan_count'] = scanner.scan_count
             
             session_summary = scanner.current_session.copy()
             scanner.current_session = None
             scanner.scanning_active = False
+            publish_status_change()
+            events.publish('session_ended', session_summary)
+            if image_queue is not None:
+                image_queue.notify()
             
             return jsonify({
                 'success': True,
@@ -342,11 +1064,11 @@ def get_cpu_temperature():
     except:
         return 0.0
 
-def get_cpu_usage():
-    """Get CPU usage percentage"""
+def get_cpu_usage(interval=None):
+    """Get CPU usage percentage (interval=None returns the usage since the last call without waiting)"""
     try:
         import psutil
-        return psutil.cpu_percent(interval=1)
+        return psutil.cpu_percent(interval=interval)
     except:
         return 0.0
 
@@ -358,46 +1080,227 @@ def get_memory_usage():
     except:
         return 0.0
 
-def update_firebase_status():
-    """Periodically update Firebase with Raspberry Pi status"""
-    while True:
+def get_camera_fps():
+    """Frame rate of the background grabber, 0 while the camera is off"""
+    grabber = scanner.grabber
+    return grabber.fps() if grabber is not None else 0.0
+
+# One sampler takes every system reading; status requests only read its latest sample
+metrics = MetricsSampler({
+    'cpu_usage': get_cpu_usage,
+    'memory_usage': get_memory_usage,
+    'cpu_temperature': get_cpu_temperature,
+    'camera_fps': get_camera_fps
+}, METRICS_INTERVAL, METRICS_HISTORY)
+
+def system_info():
+    """System readings from the latest metrics sample"""
+    sample = metrics.latest()
+    return {
+        'cpu_temperature': sample['cpu_temperature'],
+        'cpu_usage': sample['cpu_usage'],
+        'memory_usage': sample['memory_usage'],
+        'camera_fps': sample['camera_fps']
+    }
+
+@app.route('/api/metrics/history', methods=['GET'])
+def get_metrics_history():
+    """Recent CPU, memory, temperature and camera FPS readings.
+    
+    `seconds` limits the window (default: everything kept) and `points`
+    the number of averaged points per series.
+    """
+    try:
+        seconds = request.args.get('seconds', type=float)
+        points = request.args.get('points', 120, type=int)
+        history = metrics.history(seconds, points)
+        
+        return jsonify({
+            'success': True,
+            'interval': metrics.interval,
+            'timestamps': history['timestamps'],
+            'series': history['series']
+        })
+        
+    except Exception as e:
+        logger.error(f"Metrics history error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/metrics/stages', methods=['GET'])
+def get_stage_metrics():
+    """Percentiles of the time recent scans spent in each pipeline stage, in milliseconds"""
+    try:
+        return jsonify({
+            'success': True,
+            'scans': scan_stages.scans,
+            'window': scan_stages.window,
+            'stages': scan_stages.percentiles()
+        })
+        
+    except Exception as e:
+        logger.error(f"Stage metrics error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/debug/profile', methods=['GET', 'POST', 'DELETE'])
+@require_auth
+def debug_profile():
+    """Profile the scanner in the field (requires authentication)
+    
+    POST {"scans": N} profiles the next N /api/scan requests with cProfile;
+    POST {"seconds": T} samples every thread's stack for T seconds
+    ("interval_ms" sets the sampling interval). GET reports progress and
+    DELETE ends the profile early. The finished profile is downloaded from
+    /api/debug/profile/download. With the worker pool running, OMR
+    processing happens in the workers and shows up in a scans profile only
+    as waiting; start the API with SCAN_WORKERS=0 to profile it inline.
+    """
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            if data.get('scans'):
+                profiler.profile_calls(int(data['scans']))
+            elif data.get('seconds'):
+                interval_ms = float(data.get('interval_ms', 5))
+                profiler.profile_seconds(float(data['seconds']), interval_ms / 1000.0)
+            else:
+                return jsonify({'success': False, 'error': 'Send "scans" or "seconds"'}), 400
+            logger.info(f"Profiling started by {request.user.get('email')}")
+        elif request.method == 'DELETE':
+            profiler.stop()
+        
+        return jsonify({'success': True, 'profile': profiler.status()})
+        
+    except RuntimeError as e:
+        return jsonify({'success': False, 'error': str(e), 'profile': profiler.status()}), 409
+    except Exception as e:
+        logger.error(f"Profile error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/debug/profile/download', methods=['GET'])
+@require_auth
+def download_profile():
+    """The last finished profile: .pstats (scans) or folded stacks for flame graphs (seconds)"""
+    try:
+        if profiler.result is None:
+            return jsonify({'success': False, 'error': 'No finished profile'}), 404
+        
+        filename, data, mimetype = profiler.result
+        return send_file(BytesIO(data), mimetype=mimetype, as_attachment=True, download_name=filename)
+        
+    except Exception as e:
+        logger.error(f"Profile download error: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def collect_firebase_status():
+    """Current Raspberry Pi status as stored in Firebase; cheap enough to poll every second"""
+    info = system_info()
+    return {
+        'online': True,
+        'scannerReady': scanner.camera is not None,
+        'currentSession': scanner.current_session,
+        'scanCount': scanner.scan_count,
+        'systemInfo': {
+            'cpuUsage': info['cpu_usage'],
+            'memoryUsage': info['memory_usage'],
+            'temperature': info['cpu_temperature']
+        }
+    }
+
+def send_firebase_status(fields, full):
+    """Push status fields to Firebase: the whole document when `full`, otherwise only fields to merge"""
+    status_data = {
+        'action': 'update_raspberry_pi_status',
+        'data': {
+            'status': dict(fields, lastSeen=datetime.now().isoformat()),
+            'partial': not full
+        }
+    }
+    
+    response = http_client.post(FIREBASE_API_URL, json=status_data, timeout=5)
+    return response.status_code == 200
+
+def publish_status_change():
+    """Push the status right away instead of at the next check"""
+    for publisher in (status_publisher, event_status_publisher):
+        if publisher is not None:
+            publisher.notify()
+
+def wait_until_listening(port, timeout=30.0):
+    """Block until something accepts connections on `port`. Returns False on timeout"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
         try:
-            status_data = {
-                'action': 'update_raspberry_pi_status',
-                'data': {
-                    'status': {
-                        'online': True,
-                        'lastSeen': datetime.now().isoformat(),
-                        'scannerReady': scanner.camera is not None,
-                        'currentSession': scanner.current_session,
-                        'scanCount': scanner.scan_count,
-                        'systemInfo': {
-                            'cpuUsage': get_cpu_usage(),
-                            'memoryUsage': get_memory_usage(),
-                            'temperature': get_cpu_temperature()
-                        }
-                    }
-                }
-            }
-            
-            requests.post(FIREBASE_API_URL, json=status_data, timeout=5)
-        except Exception as e:
-            logger.warning(f"Firebase status update error: {e}")
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+def warm_up(port):
+    """Load OpenCV and the OMR engine, start the scan workers and open the camera in the background.
+    
+    Waits for the server to listen first so start-up is not held up. Scans
+    that arrive before the workers are running are processed in the request
+    thread, loading whatever they need on the spot.
+    """
+    global scan_pool
+    wait_until_listening(port)
+    start = time.monotonic()
+    
+    try:
+        for module in (cv2, np, omr_engine, frame_quality, scan_workers, camera_grabber, continuous_scan):
+            module.load()
+        
+        # Start the answer sheet worker processes
+        if SCAN_WORKERS > 0:
+            pool = scan_workers.ScanWorkerPool(SCAN_WORKERS, SCAN_JOB_TIMEOUT)
+            pool.start()
+            atexit.register(pool.shutdown)
+            scan_pool = pool
         
-        time.sleep(30)  # Update every 30 seconds
+        # Initialize scanner
+        if scanner.camera is None:
+            scanner.initialize_camera()
+        publish_status_change()
+        logger.info(f"Warm-up finished in {time.monotonic() - start:.2f}s")
+    except Exception as e:
+        logger.error(f"Warm-up error: {e}")
 
 # Cleanup on exit
 import atexit
 atexit.register(scanner.cleanup)
 
 if __name__ == '__main__':
-    # Start Firebase status update thread
-    status_thread = threading.Thread(target=update_firebase_status, daemon=True)
-    status_thread.start()
+    # Sample system readings in the background for /api/status and the publishers
+    metrics.start()
+    atexit.register(metrics.stop)
+    
+    # Push status changes to Firebase as they happen, with a heartbeat in between
+    status_publisher = StatusPublisher(collect_firebase_status, send_firebase_status, STATUS_TOLERANCES,
+                                       heartbeat_interval=STATUS_HEARTBEAT_INTERVAL,
+                                       partial=STATUS_PUSH_PARTIAL)
+    status_publisher.start()
+    
+    # One producer diffs the status for every /api/events client
+    event_status_publisher = StatusPublisher(lambda: collect_status(details=False), publish_status_event,
+                                             EVENT_STATUS_TOLERANCES)
+    event_status_publisher.start()
+    
+    # Deliver scan results to Firebase in the background, including any left from the last run
+    sync_queue = SyncQueue(SYNC_QUEUE_PATH, send_batch_to_firebase, SYNC_BATCH_SIZE,
+                           SYNC_BATCH_BYTES, SYNC_BATCH_WAIT_MS / 1000.0)
+    sync_queue.start()
+    atexit.register(sync_queue.stop)
+    
+    # Sheet images drain separately, capped and only when IMAGE_SYNC_MODE allows
+    image_queue = SyncQueue(SYNC_QUEUE_PATH, send_images_to_firebase, kind='image',
+                            bandwidth=IMAGE_SYNC_BANDWIDTH_KBPS * 1024 or None, ready=image_sync_ready)
+    image_queue.start()
+    atexit.register(image_queue.stop)
     
-    # Initialize scanner
-    scanner.initialize_camera()
+    # Load the image processing stack, start the workers and open the camera once the server is up
+    threading.Thread(target=warm_up, args=(API_PORT,), name='warm-up', daemon=True).start()
     
     # Start the Flask app
     logger.info("Starting Raspberry Pi API server...")
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=API_PORT, debug=False)
\ No newline at end of file
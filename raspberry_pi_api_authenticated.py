@@ -11,11 +11,10 @@ This API runs on the Raspberry Pi and handles:
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from functools import wraps
-import jwt
-import os
 import time
-import requests
+import http_client
+import prometheus_metrics
+from api_auth import require_auth, token_verifications
 from datetime import datetime
 import logging
 
@@ -28,46 +27,16 @@ CORS(app)
 
 # Configuration
 AUTH_API_URL = "http://localhost:5001"  # Real auth API
-JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 FIREBASE_PROJECT_ID = "rosec-57d1d"
 FIREBASE_API_URL = f"https://us-central1-{FIREBASE_PROJECT_ID}.cloudfunctions.net/raspberryPiAPI"
 
 # Store authenticated user info
 current_user = None
 
-# Authentication decorator
-def require_auth(f):
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        
-        if not token:
-            return jsonify({
-                'success': False,
-                'error': 'Authentication required'
-            }), 401
-        
-        # Remove 'Bearer ' prefix if present
-        if token.startswith('Bearer '):
-            token = token[7:]
-        
-        try:
-            # Verify token
-            decoded = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-            request.user = decoded
-            return f(*args, **kwargs)
-        except jwt.ExpiredSignatureError:
-            return jsonify({
-                'success': False,
-                'error': 'Token expired'
-            }), 401
-        except jwt.InvalidTokenError:
-            return jsonify({
-                'success': False,
-                'error': 'Invalid token'
-            }), 401
-    
-    return decorated_function
+# Prometheus metrics at /metrics
+prometheus = prometheus_metrics.instrument(app, prometheus_metrics.Registry())
+prometheus.register(token_verifications)
+scans_total = prometheus.counter('rosec_scans_total', 'Answer sheets scanned', ('source',))
 
 # Mock scanner class (replace with real implementation)
 class AnswerSheetScanner:
@@ -94,7 +63,7 @@ def authenticate():
             }), 400
         
         # Forward to auth API
-        response = requests.post(
+        response = http_client.post(
             f"{AUTH_API_URL}/api/login",
             json={'email': email, 'password': password},
             timeout=10
@@ -185,6 +154,7 @@ def scan_answer_sheet():
         }
         
         scanner.scan_count += 1
+        scans_total.inc(source='scan')
         
         logger.info(f"Scan completed by {request.user.get('email')}")
         
@@ -1,22 +1,23 @@
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-import firebase_admin
-from firebase_admin import credentials, auth, firestore
 from datetime import datetime
 import jwt
 import os
+import prometheus_metrics
+import firebase_client
 
 app = Flask(__name__)
 CORS(app)
 
-# Initialize Firebase Admin SDK
-cred = credentials.Certificate("serviceAccountKey.json.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
-
 # Secret key for JWT (in production, use environment variable)
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 
+# Prometheus metrics at /metrics
+prometheus = prometheus_metrics.instrument(app, prometheus_metrics.Registry())
+token_verifications = prometheus.counter('rosec_token_verifications_total',
+                                         'Token checks by outcome', ('outcome',))
+logins = prometheus.counter('rosec_logins_total', 'Login attempts by outcome', ('outcome',))
+
 @app.route('/api/login', methods=['POST'])
 def login():
     """Real authentication endpoint using Firebase Admin SDK"""
@@ -26,24 +27,28 @@ def login():
         password = data.get("password", "")
         
         if not email or not password:
+            logins.inc(outcome='missing')
             return jsonify({
                 "success": False,
                 "message": "Email and password required"
             }), 400
         
-        # Verify user exists in Firebase Auth
+        # Verify user exists in Firebase Auth (initialized on the first login)
+        auth = firebase_client.auth()
         try:
             user = auth.get_user_by_email(email)
         except auth.UserNotFoundError:
+            logins.inc(outcome='unknown_user')
             return jsonify({
                 "success": False,
                 "message": "Invalid credentials"
             }), 401
         
         # Get user role from Firestore
-        user_doc = db.collection('users').document(user.uid).get()
+        user_doc = firebase_client.firestore_client().collection('users').document(user.uid).get()
         
         if not user_doc.exists:
+            logins.inc(outcome='no_profile')
             return jsonify({
                 "success": False,
                 "message": "User profile not found"
@@ -62,6 +67,7 @@ def login():
             'exp': datetime.utcnow().timestamp() + 86400  # 24 hours
         }, JWT_SECRET, algorithm='HS256')
         
+        logins.inc(outcome='success')
         return jsonify({
             "success": True,
             "message": "Login successful",
@@ -70,6 +76,7 @@ def login():
         
     except Exception as e:
         print(f"Login error: {e}")
+        logins.inc(outcome='error')
         return jsonify({
             "success": False,
             "message": "Authentication failed"
@@ -83,6 +90,7 @@ def verify_token():
         token = data.get("token", "")
         
         if not token:
+            token_verifications.inc(outcome='missing')
             return jsonify({
                 "success": False,
                 "message": "Token required"
@@ -90,6 +98,7 @@ def verify_token():
         
         # Decode and verify JWT
         decoded = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+        token_verifications.inc(outcome='valid')
         
         return jsonify({
             "success": True,
@@ -101,11 +110,13 @@ def verify_token():
         })
         
     except jwt.ExpiredSignatureError:
+        token_verifications.inc(outcome='expired')
         return jsonify({
             "success": False,
             "message": "Token expired"
         }), 401
     except jwt.InvalidTokenError:
+        token_verifications.inc(outcome='invalid')
         return jsonify({
             "success": False,
             "message": "Invalid token"
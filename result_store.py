@@ -0,0 +1,122 @@
+"""
+Local scan result store for the Rosec scanner
+This module handles:
+- Recording every scanned sheet in an indexed SQLite database (WAL mode)
+- Filtering by exam, student, session and time range
+- Cursor pagination and field projection for /api/scan-results
+"""
+
+import json
+import sqlite3
+import threading
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+class ScanResultStore:
+    """Append-only table of scan results with one index per lookup path.
+
+    Records come back as the stored results dict plus 'id', 'examId',
+    'studentId', 'sessionId' and 'timestamp', newest first. The database file
+    is only opened (and created) on first use, not when the store is made.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+
+    @property
+    def _db(self):
+        """The open connection; callers hold self._lock"""
+        if self._connection is None:
+            self._connection = self._open()
+        return self._connection
+
+    def _open(self):
+        db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS scan_results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                exam_id TEXT,
+                student_id TEXT,
+                session_id TEXT,
+                timestamp TEXT NOT NULL,
+                data TEXT NOT NULL
+            )
+        ''')
+        # Each index ends in id so filtered pages are read straight off the index in id order
+        for column in ('exam_id', 'student_id', 'session_id', 'timestamp'):
+            db.execute(f'CREATE INDEX IF NOT EXISTS scan_results_{column} ON scan_results ({column}, id)')
+        return db
+
+    def add(self, results, exam_id=None, student_id=None, session_id=None, timestamp=None):
+        """Store one sheet's results and return the record id"""
+        with self._lock:
+            cursor = self._db.execute(
+                'INSERT INTO scan_results (exam_id, student_id, session_id, timestamp, data) VALUES (?, ?, ?, ?, ?)',
+                (exam_id, student_id, session_id, timestamp, json.dumps(results, default=str)))
+        return cursor.lastrowid
+
+    def query(self, exam_id=None, student_id=None, session_id=None, since=None, until=None,
+              cursor=None, limit=DEFAULT_PAGE_SIZE, fields=None):
+        """One page of records matching the filters.
+
+        Returns {'results': [...], 'next_cursor': id or None}. Pass `next_cursor`
+        back as `cursor` for the following page. `fields` limits each record to
+        the listed keys.
+        """
+        clauses, params = [], []
+        for column, value in (('exam_id', exam_id), ('student_id', student_id), ('session_id', session_id)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if since is not None:
+            clauses.append('timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('timestamp < ?')
+            params.append(until)
+        if cursor is not None:
+            clauses.append('id < ?')
+            params.append(int(cursor))
+
+        limit = max(1, min(MAX_PAGE_SIZE, int(limit)))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        sql = (f'SELECT id, exam_id, student_id, session_id, timestamp, data FROM scan_results '
+               f'{where} ORDER BY id DESC LIMIT ?')
+        with self._lock:
+            rows = self._db.execute(sql, params + [limit + 1]).fetchall()
+
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        records = []
+        for row_id, row_exam, row_student, row_session, row_timestamp, data in rows[:limit]:
+            record = json.loads(data)
+            record.update({'id': row_id, 'examId': row_exam, 'studentId': row_student,
+                           'sessionId': row_session, 'timestamp': row_timestamp})
+            if fields:
+                record = {name: record[name] for name in fields if name in record}
+            records.append(record)
+        return {'results': records, 'next_cursor': next_cursor}
+
+    def count(self, exam_id=None):
+        with self._lock:
+            if exam_id is None:
+                return self._db.execute('SELECT COUNT(*) FROM scan_results').fetchone()[0]
+            return self._db.execute('SELECT COUNT(*) FROM scan_results WHERE exam_id = ?', (exam_id,)).fetchone()[0]
+
+def query_args(args):
+    """query() keyword arguments from /api/scan-results query parameters"""
+    fields = args.get('fields')
+    return {
+        'exam_id': args.get('examId'),
+        'student_id': args.get('studentId'),
+        'session_id': args.get('sessionId'),
+        'since': args.get('since'),
+        'until': args.get('until'),
+        'cursor': args.get('cursor', type=int),
+        'limit': args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+        'fields': [name.strip() for name in fields.split(',') if name.strip()] if fields else None
+    }
@@ -0,0 +1,172 @@
+"""
+On-demand profiling for the Rosec scanner
+This module handles:
+- Deterministic (cProfile) profiles of the next N calls of a wrapped handler, saved as pstats
+- Sampling profiles of every thread for T seconds, saved as folded stacks for flame graphs
+- Keeping the last finished profile for download
+"""
+
+import cProfile
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_INTERVAL = 0.005     # Seconds between stack samples
+MAX_SECONDS = 300.0
+MAX_CALLS = 1000
+
+class ScanProfiler:
+    """Profiles wrapped handlers or the whole process on request.
+
+    While idle, a handler wrapped with `wrap` costs one attribute check per
+    call and no thread runs. `profile_calls(n)` profiles the next `n` calls
+    with cProfile (one call at a time; calls that overlap a profiled one run
+    unprofiled) and produces a .pstats file. `profile_seconds(t)` samples the
+    stacks of every thread for `t` seconds and produces folded stacks
+    ("frame;frame;frame count" lines), the input format of flamegraph.pl and
+    speedscope.
+    """
+
+    def __init__(self):
+        self.mode = None            # 'calls' or 'seconds' while profiling
+        self.started_at = None
+        self.calls_left = 0
+        self.calls_profiled = 0
+        self.result = None          # (filename, bytes, mimetype) of the last finished profile
+        self._stats = None
+        self._call_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    @property
+    def active(self):
+        return self.mode is not None
+
+    def wrap(self, fn):
+        """Profile `fn` while a 'calls' profile is running"""
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if self.calls_left <= 0:
+                return fn(*args, **kwargs)
+            return self._call_profiled(fn, args, kwargs)
+        return wrapper
+
+    def profile_calls(self, count):
+        """Profile the next `count` calls of every wrapped handler"""
+        with self._lock:
+            if self.active:
+                raise RuntimeError('A profile is already running')
+            self.mode = 'calls'
+            self.started_at = time.time()
+            self.calls_profiled = 0
+            self._stats = None
+            self.calls_left = max(1, min(MAX_CALLS, int(count)))
+
+    def profile_seconds(self, seconds, interval=DEFAULT_SAMPLE_INTERVAL):
+        """Sample every thread's stack for `seconds`"""
+        with self._lock:
+            if self.active:
+                raise RuntimeError('A profile is already running')
+            self.mode = 'seconds'
+            self.started_at = time.time()
+            self._stop.clear()
+            seconds = max(0.1, min(MAX_SECONDS, float(seconds)))
+            self._sampler = threading.Thread(target=self._sample, args=(seconds, max(0.001, interval)),
+                                             name='profile-sampler', daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        """End the running profile early, keeping what was collected"""
+        if self.mode == 'seconds':
+            self._stop.set()
+            sampler = self._sampler
+            if sampler is not None:
+                sampler.join(timeout=5)
+        elif self.mode == 'calls':
+            with self._lock:
+                self.calls_left = 0
+                self._finish_calls()
+
+    def status(self):
+        return {
+            'active': self.active,
+            'mode': self.mode,
+            'started_at': self.started_at,
+            'calls_left': self.calls_left if self.mode == 'calls' else None,
+            'calls_profiled': self.calls_profiled,
+            'result': {'filename': self.result[0], 'bytes': len(self.result[1])} if self.result else None
+        }
+
+    def _call_profiled(self, fn, args, kwargs):
+        # cProfile can only run in one thread at a time
+        if not self._call_lock.acquire(blocking=False):
+            return fn(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.disable()
+        finally:
+            self._call_lock.release()
+            with self._lock:
+                if self.calls_left > 0:
+                    self.calls_left -= 1
+                    self.calls_profiled += 1
+                    if self._stats is None:
+                        self._stats = pstats.Stats(profile)
+                    else:
+                        self._stats.add(profile)
+                    if self.calls_left == 0:
+                        self._finish_calls()
+
+    def _finish_calls(self):
+        # Called with the lock held
+        if self.mode != 'calls':
+            return
+        if self._stats is not None:
+            filename = f"scan-profile-{time.strftime('%Y%m%d-%H%M%S')}.pstats"
+            # The same bytes pstats.Stats.dump_stats() writes
+            self.result = (filename, marshal.dumps(self._stats.stats), 'application/octet-stream')
+            logger.info(f"Profiled {self.calls_profiled} call(s)")
+        self._stats = None
+        self.mode = None
+
+    def _sample(self, seconds, interval):
+        stacks = Counter()
+        own = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + seconds
+        samples = 0
+        while time.monotonic() < deadline and not self._stop.wait(interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append(names.get(thread_id, str(thread_id)))
+                stacks[';'.join(reversed(stack))] += 1
+            samples += 1
+
+        with self._lock:
+            filename = f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded"
+            body = ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+            self.result = (filename, body.encode('utf-8'), 'text/plain')
+            self.mode = None
+            self._sampler = None
+        logger.info(f"Took {samples} stack samples")
@@ -0,0 +1,90 @@
+"""
+Scan pipeline timing for the Rosec scanner
+This module handles:
+- Timing each stage of a scan (capture, image processing, encode, persistence, sync)
+  on the monotonic performance counter
+- Keeping a rolling window of recent stage times
+- Reporting per-stage percentiles
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_WINDOW = 500        # Recent scans kept per stage
+PERCENTILES = (50, 90, 99)
+
+class StageTimer:
+    """Milliseconds spent in each stage of one scan.
+
+    Plain data only, so worker processes can send their timings back with
+    the results.
+    """
+
+    def __init__(self, timings=None):
+        self.timings = dict(timings or {})
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds * 1000.0
+
+    def update(self, timings):
+        """Add the stage times (in milliseconds) measured elsewhere, e.g. in a worker"""
+        for name, ms in (timings or {}).items():
+            self.timings[name] = self.timings.get(name, 0.0) + ms
+
+    def total(self):
+        return sum(self.timings.values())
+
+    def as_dict(self):
+        """Stage times rounded for a response, plus their total"""
+        report = {name: round(ms, 3) for name, ms in self.timings.items()}
+        report['total'] = round(self.total(), 3)
+        return report
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+class StageStats:
+    """Rolling per-stage timing percentiles over the last `window` scans"""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self.scans = 0
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, timer):
+        with self._lock:
+            self.scans += 1
+            for name, ms in timer.timings.items():
+                self._stages.setdefault(name, deque(maxlen=self.window)).append(ms)
+            self._stages.setdefault('total', deque(maxlen=self.window)).append(timer.total())
+
+    def percentiles(self):
+        """{stage: {'count', 'p50', 'p90', 'p99', 'max'}} in milliseconds"""
+        with self._lock:
+            stages = {name: sorted(samples) for name, samples in self._stages.items()}
+        report = {}
+        for name, ordered in stages.items():
+            entry = {'count': len(ordered)}
+            for pct in PERCENTILES:
+                entry[f'p{pct}'] = round(percentile(ordered, pct), 3)
+            entry['max'] = round(ordered[-1], 3)
+            report[name] = entry
+        return report
+
+    def reset(self):
+        with self._lock:
+            self.scans = 0
+            self._stages.clear()
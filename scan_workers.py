@@ -0,0 +1,236 @@
+"""
+Answer sheet processing workers for the Rosec scanner
+This module handles:
+- The frame-to-results OMR pipeline as a plain function
+- Running that pipeline in a pool of worker processes
+- Handing frames to workers through shared memory instead of pickled copies
+- Decoding and processing uploaded images inside the workers
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import cv2
+import numpy as np
+
+import frame_quality
+import omr_engine
+import sheet_alignment
+from scan_timing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_TIMEOUT = 10.0
+
+class SheetNotFound(Exception):
+    """The sheet's corner markers are not in the frame, so it cannot be read reliably"""
+
+    reason = 'no_markers'
+
+def process_frame(image, compiled, previous_alignment=None, timer=None, allow_unaligned=False, small=None):
+    """Read an answer sheet frame against a compiled template. Returns (results, alignment)
+
+    `small` is the frame's sheet_alignment.downscale() copy when the caller
+    already made one. Raises SheetNotFound when the corner markers cannot be found, unless
+    `allow_unaligned` is set for images that are already cropped to the
+    sheet; those are then read as a whole. The time spent in each stage
+    comes back in milliseconds as results['timings'].
+    """
+    timer = timer or StageTimer()
+
+    # Reuse the last homography while its markers have not moved, otherwise
+    # locate the sheet by its corner markers on a downscaled copy
+    with timer.stage('contours'):
+        alignment = sheet_alignment.locate_sheet(image, previous_alignment, small)
+    if alignment is None and not allow_unaligned:
+        raise SheetNotFound('Corner markers not found')
+
+    # Only the bubble region is converted, blurred and thresholded at full resolution
+    # when the sheet was found; the grayscale stage includes its de-skew
+    with timer.stage('grayscale'):
+        if alignment is not None:
+            gray = sheet_alignment.extract_region(image, alignment.homography, compiled.bounds)
+        else:
+            logger.info("Corner markers not found, reading the pre-cropped image without alignment")
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    with timer.stage('blur'):
+        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    with timer.stage('threshold'):
+        _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    with timer.stage('bubbles'):
+        results = omr_engine.read_sheet(thresh, compiled, aligned=alignment is not None)
+
+    results['aligned'] = alignment is not None
+    results['homography_reused'] = alignment is not None and alignment.reused
+    results['timings'] = timer.timings
+    return results, alignment
+
+# Shared memory blocks this worker has already mapped, by name, oldest first.
+# The parent unlinks spare blocks, which only frees them once every worker
+# has unmapped them too, so just the last few stay mapped.
+_attached = {}
+MAX_ATTACHED = 4
+
+def process_encoded(data, compiled, allow_unaligned=False):
+    """Decode an uploaded image and read it if it passes the quality gate.
+
+    Returns (results or None when rejected, quality).
+    """
+    timer = StageTimer()
+    with timer.stage('decode'):
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image")
+    # The quality gate and the marker search share one downscaled copy
+    with timer.stage('quality'):
+        small = sheet_alignment.downscale(image)
+        quality = frame_quality.check_frame(image, small)
+    if not quality['ok']:
+        return None, quality
+    try:
+        results, _ = process_frame(image, compiled, timer=timer, allow_unaligned=allow_unaligned, small=small)
+    except SheetNotFound as e:
+        return None, dict(quality, ok=False, reason=e.reason)
+    results['quality'] = quality
+    return results, quality
+
+def attach_shared_memory(name):
+    """Attach to a parent's shared memory block without letting this process own it"""
+    shm = _attached.pop(name, None)
+    if shm is not None:
+        _attached[name] = shm
+        return shm
+    try:
+        shm = SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always registers the block, which is harmless here: spawned
+        # workers share the parent's resource tracker and the parent unlinks it
+        shm = SharedMemory(name=name)
+    _attached[name] = shm
+    for old in list(_attached)[:-MAX_ATTACHED]:
+        try:
+            _attached[old].close()
+        except BufferError:
+            # Still viewed by a frame; try again on the next attach
+            continue
+        del _attached[old]
+    return shm
+
+def _init_worker():
+    """Worker start-up: one OpenCV thread per process so the workers do not oversubscribe the cores"""
+    cv2.setNumThreads(1)
+
+def _process_shared_frame(name, shape, dtype, compiled, previous_alignment):
+    """Worker entry point: view the frame in shared memory and process it in place"""
+    image = np.ndarray(shape, dtype=dtype, buffer=attach_shared_memory(name).buf)
+    return process_frame(image, compiled, previous_alignment)
+
+class ScanWorkerPool:
+    """Pool of worker processes running process_frame on shared-memory frames.
+
+    Frame buffers are recycled between jobs so neither side pays for mapping
+    and faulting in fresh memory on every frame. At most one spare buffer per
+    worker is kept; a burst of queued frames does not pin its memory afterwards.
+    """
+
+    def __init__(self, workers=None, timeout=DEFAULT_JOB_TIMEOUT):
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self._executor = None
+        self._free_buffers = []
+        self._buffers = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker processes"""
+        # Spawned workers do not inherit the Flask server's threads or camera handle
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context('spawn'),
+                                             initializer=_init_worker)
+        logger.info(f"Scan worker pool started with {self.workers} workers")
+
+    def _acquire_buffer(self, size):
+        """Take a free shared memory block of exactly `size` bytes, or create one"""
+        with self._lock:
+            for index, shm in enumerate(self._free_buffers):
+                if shm.size >= size and shm.size - size < 4096:
+                    return self._free_buffers.pop(index)
+        shm = SharedMemory(create=True, size=size)
+        with self._lock:
+            self._buffers.append(shm)
+        return shm
+
+    def _release_buffer(self, shm):
+        with self._lock:
+            if shm not in self._buffers:
+                return
+            self._free_buffers.append(shm)
+            if len(self._free_buffers) <= self.workers:
+                return
+            # The oldest spare goes, so buffers of an old frame size do not linger
+            shm = self._free_buffers.pop(0)
+            self._buffers.remove(shm)
+        shm.close()
+        shm.unlink()
+
+    def submit(self, image, compiled, previous_alignment=None):
+        """Queue a frame for processing and return its future"""
+        if self._executor is None:
+            self.start()
+
+        image = np.ascontiguousarray(image)
+        shm = self._acquire_buffer(max(1, image.nbytes))
+        np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[...] = image
+
+        try:
+            future = self._submit(_process_shared_frame, shm.name, image.shape, image.dtype.str,
+                                  compiled, previous_alignment)
+        except Exception:
+            self._release_buffer(shm)
+            raise
+
+        # The buffer is reused once the worker is done, even if the caller timed out
+        future.add_done_callback(lambda _: self._release_buffer(shm))
+        return future
+
+    def submit_encoded(self, data, compiled, allow_unaligned=False):
+        """Queue an encoded image (JPEG/PNG bytes) to be decoded and processed in a worker.
+
+        Encoded images are several times smaller than decoded frames, so they are
+        sent as they are.
+        """
+        if self._executor is None:
+            self.start()
+        return self._submit(process_encoded, data, compiled, allow_unaligned)
+
+    def _submit(self, fn, *args):
+        try:
+            return self._executor.submit(fn, *args)
+        except BrokenProcessPool:
+            logger.warning("Scan worker pool broken, restarting it")
+            self.start()
+            return self._executor.submit(fn, *args)
+
+    def process(self, image, compiled, previous_alignment=None):
+        """Process a frame in a worker. Returns (results, alignment).
+
+        Raises concurrent.futures.TimeoutError past the job timeout and
+        SheetNotFound when the frame shows no sheet.
+        """
+        return self.submit(image, compiled, previous_alignment).result(timeout=self.timeout)
+
+    def shutdown(self):
+        """Stop the worker processes and free the frame buffers"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        with self._lock:
+            for shm in self._buffers:
+                shm.close()
+                shm.unlink()
+            self._buffers = []
+            self._free_buffers = []
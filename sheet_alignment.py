@@ -0,0 +1,194 @@
+"""
+Sheet alignment for Rosec answer sheets
+This module handles:
+- Detecting the four square corner markers (fiducials) on a downscaled frame
+- Computing the homography from the camera frame to the canonical sheet
+- Reusing the last homography while the sheet has not moved, checked on
+  full-resolution patches around the markers before any downscaling
+- Warping only the bubble region of the full-resolution frame
+"""
+
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from omr_engine import SHEET_WIDTH, SHEET_HEIGHT
+
+# Corner markers in canonical sheet pixels: solid squares centred at these
+# points, ordered top-left, top-right, bottom-right, bottom-left.
+FIDUCIAL_SIZE = 30
+FIDUCIAL_CENTERS = np.array([
+    [35, 35],
+    [SHEET_WIDTH - 35, 35],
+    [SHEET_WIDTH - 35, SHEET_HEIGHT - 35],
+    [35, SHEET_HEIGHT - 35],
+], dtype=np.float32)
+
+# A marker blob must be roughly square and solid, and the four markers must
+# be about as large as the sheet they span predicts
+MIN_MARKER_FRACTION = 0.008     # Minimum marker side relative to the shorter frame side
+MAX_MARKER_FRACTION = 0.15
+MIN_MARKER_EXTENT = 0.75
+MAX_MARKER_ASPECT = 1.4
+MARKER_SIZE_TOLERANCE = 0.35
+
+# Markers count as unmoved while this share of the probe box is still dark and
+# this share of the paper around it is still light
+REUSE_FILL_RATIO = 0.8
+
+# Frames are searched for markers at this width; bubbles are still read at full resolution
+LOCATE_WIDTH = 640
+
+# `corners` and `marker_half` are in the coordinates of the downscaled frame the
+# markers were found in (`scale` times the full frame); `homography` maps
+# full-resolution frame pixels to canonical sheet pixels.
+Alignment = namedtuple('Alignment', ['corners', 'marker_half', 'homography', 'reused', 'scale'])
+
+def find_fiducials(binary):
+    """Locate the four corner markers in a thresholded frame (paper 255, ink 0).
+
+    Returns (corners, marker half-size) with corners ordered TL, TR, BR, BL in
+    frame pixels, or None when four markers cannot be found.
+    """
+    height, width = binary.shape[:2]
+    shorter = min(width, height)
+    min_side = shorter * MIN_MARKER_FRACTION
+    max_side = shorter * MAX_MARKER_FRACTION
+
+    contours, _ = cv2.findContours(255 - binary, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+    candidates = []
+    sides = []
+    for contour in contours:
+        (cx, cy), (w, h), _ = cv2.minAreaRect(contour)
+        if not (min_side <= w <= max_side and min_side <= h <= max_side):
+            continue
+        if max(w, h) > MAX_MARKER_ASPECT * min(w, h):
+            continue
+        # Pixel area of the blob (the contour runs through boundary pixel centres)
+        area = cv2.contourArea(contour) + cv2.arcLength(contour, True) / 2.0 + 1.0
+        if area < MIN_MARKER_EXTENT * (w + 1) * (h + 1):
+            continue
+        candidates.append((cx, cy))
+        sides.append((w + h) / 2.0 + 1.0)
+
+    if len(candidates) < 4:
+        return None
+
+    # The markers are the extreme candidates along both diagonals
+    points = np.array(candidates, dtype=np.float32)
+    diagonal = points[:, 0] + points[:, 1]
+    anti_diagonal = points[:, 0] - points[:, 1]
+    chosen = np.array([diagonal.argmin(), anti_diagonal.argmax(),
+                       diagonal.argmax(), anti_diagonal.argmin()])
+    if len(set(chosen.tolist())) < 4:
+        return None
+
+    corners = points[chosen]
+    if not cv2.isContourConvex(corners.reshape(-1, 1, 2)):
+        return None
+
+    # Filled bubbles near the edge are smaller than the markers the sheet size predicts
+    span = np.linalg.norm(corners[1] - corners[0]) + np.linalg.norm(corners[2] - corners[3])
+    expected = FIDUCIAL_SIZE * span / (2.0 * (FIDUCIAL_CENTERS[1, 0] - FIDUCIAL_CENTERS[0, 0]))
+    chosen_sides = np.array(sides)[chosen]
+    if np.any(np.abs(chosen_sides - expected) > MARKER_SIZE_TOLERANCE * expected):
+        return None
+    return corners, float(np.median(chosen_sides)) / 2.0
+
+def markers_present(image, alignment):
+    """Check that the markers of a previous alignment are still in place.
+
+    Only a small full-resolution patch around each marker is looked at: its
+    centre must still be dark and the paper just around the marker light.
+    """
+    height, width = image.shape[:2]
+    half = alignment.marker_half / alignment.scale
+    probe = max(1, int(half * 0.5))
+    reach = max(probe + 2, int(half * 1.8))
+    margin = max(1, reach - int(half * 1.3))
+    for x, y in alignment.corners / alignment.scale:
+        x, y = int(round(x)), int(round(y))
+        if x - reach < 0 or y - reach < 0 or x + reach >= width or y + reach >= height:
+            return False
+        patch = image[y - reach:y + reach + 1, x - reach:x + reach + 1]
+        if patch.ndim == 3:
+            patch = cv2.cvtColor(patch, cv2.COLOR_BGR2GRAY)
+        _, patch = cv2.threshold(patch, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+        centre = patch[reach - probe:reach + probe + 1, reach - probe:reach + probe + 1]
+        if 1.0 - centre.mean() / 255.0 < REUSE_FILL_RATIO:
+            return False
+        inner = patch[margin:-margin, margin:-margin]
+        paper = (float(patch.sum()) - float(inner.sum())) / 255.0 / (patch.size - inner.size)
+        if paper < REUSE_FILL_RATIO:
+            return False
+    return True
+
+def align(binary, scale=1.0):
+    """Find the frame-to-sheet homography from the markers in a thresholded frame.
+
+    `binary` is the thresholded frame downscaled by `scale`. Returns an
+    Alignment, or None when the sheet's markers cannot be found.
+    """
+    found = find_fiducials(binary)
+    if found is None:
+        return None
+    corners, marker_half = found
+    homography = cv2.getPerspectiveTransform(corners, FIDUCIAL_CENTERS)
+    homography = homography @ np.diag([scale, scale, 1.0])
+    return Alignment(corners, marker_half, homography, False, scale)
+
+def downscale(image):
+    """Grayscale copy of a frame at most LOCATE_WIDTH wide, for the frame checks to share"""
+    small = image
+    if image.shape[1] > LOCATE_WIDTH:
+        scale = LOCATE_WIDTH / image.shape[1]
+        small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return small
+
+def locate_sheet(image, previous=None, small=None):
+    """Locate the sheet in a BGR or grayscale frame.
+
+    `previous` is reused while its markers have not moved, without touching
+    the rest of the frame. Otherwise the markers are searched for on the
+    downscaled copy, `small` when the caller already made one with downscale().
+    """
+    if previous is not None and markers_present(image, previous):
+        return previous._replace(reused=True)
+
+    if small is None:
+        small = downscale(image)
+    blurred = cv2.GaussianBlur(small, (3, 3), 0)
+    _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return align(thresh, small.shape[1] / image.shape[1])
+
+def warp_region(image, homography, bounds):
+    """Warp only the canonical-sheet rectangle `bounds` (x0, y0, x1, y1) out of a frame"""
+    x0, y0, x1, y1 = bounds
+    shift = np.array([[1, 0, -x0], [0, 1, -y0], [0, 0, 1]], dtype=np.float64)
+    return cv2.warpPerspective(image, shift @ homography, (int(x1 - x0), int(y1 - y0)),
+                               flags=cv2.INTER_LINEAR, borderValue=255)
+
+def extract_region(image, homography, bounds):
+    """Grayscale, de-skewed `bounds` region of a full-resolution frame.
+
+    Only the frame pixels under the region are converted to grayscale.
+    """
+    x0, y0, x1, y1 = bounds
+    outline = np.array([[[x0, y0], [x1, y0], [x1, y1], [x0, y1]]], dtype=np.float64)
+    frame_outline = cv2.perspectiveTransform(outline, np.linalg.inv(homography))[0]
+
+    height, width = image.shape[:2]
+    left, top = np.maximum(np.floor(frame_outline.min(axis=0)).astype(int) - 1, 0)
+    right = min(width, int(np.ceil(frame_outline[:, 0].max())) + 2)
+    bottom = min(height, int(np.ceil(frame_outline[:, 1].max())) + 2)
+
+    crop = image[top:bottom, left:right]
+    if crop.ndim == 3:
+        crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    offset = np.array([[1, 0, left], [0, 1, top], [0, 0, 1]], dtype=np.float64)
+    return warp_region(crop, homography @ offset, bounds)
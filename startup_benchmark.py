@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the Rosec Flask APIs
+Starts an API script repeatedly and reports:
+- Time from launch to the first successful response
+- Optionally, time until /api/status reports the scanner ready (camera warmed up)
+
+Usage:
+    python3 startup_benchmark.py raspberry_pi_api.py --runs 5
+    python3 startup_benchmark.py mock_pi_api.py --path /api/status
+    python3 startup_benchmark.py real_auth_api.py --port 5001 --path /api/health
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+def poll(url, deadline, ready=None):
+    """Seconds on the clock when `url` first answers 200 (and `ready(body)` holds), or None"""
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200 and (ready is None or ready(response.read())):
+                    return time.monotonic()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    return None
+
+def scanner_ready(body):
+    try:
+        return bool(json.loads(body).get('status', {}).get('scanner_ready'))
+    except ValueError:
+        return False
+
+def run_once(script, port, path, timeout, until_ready):
+    env = dict(os.environ, API_PORT=str(port))
+    start = time.monotonic()
+    process = subprocess.Popen([sys.executable, script], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f'http://127.0.0.1:{port}{path}'
+        first = poll(url, start + timeout)
+        ready = None
+        if first is not None and until_ready:
+            ready = poll(f'http://127.0.0.1:{port}/api/status', start + timeout, scanner_ready)
+        return (first - start if first else None), (ready - start if ready else None)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+def summarize(name, values):
+    values = [value for value in values if value is not None]
+    if not values:
+        print(f"{name}: no successful runs")
+        return
+    print(f"{name}: median {statistics.median(values):.3f}s, "
+          f"min {min(values):.3f}s, max {max(values):.3f}s ({len(values)} runs)")
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure time-to-first-response of an API script')
+    parser.add_argument('script', nargs='?', default='raspberry_pi_api.py')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--path', default='/api/status', help='Route polled for the first response')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=60.0, help='Seconds to wait per run')
+    parser.add_argument('--until-ready', action='store_true',
+                        help='Also wait for /api/status to report scanner_ready')
+    args = parser.parse_args()
+
+    first_responses, ready_times = [], []
+    for run in range(1, args.runs + 1):
+        first, ready = run_once(args.script, args.port, args.path, args.timeout, args.until_ready)
+        first_responses.append(first)
+        ready_times.append(ready)
+        line = f"Run {run}: first response {'%.3fs' % first if first is not None else 'timed out'}"
+        if args.until_ready:
+            line += f", scanner ready {'%.3fs' % ready if ready is not None else 'timed out'}"
+        print(line)
+
+    summarize('Time to first response', first_responses)
+    if args.until_ready:
+        summarize('Time to scanner ready', ready_times)
+
+if __name__ == '__main__':
+    main()
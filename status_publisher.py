@@ -0,0 +1,146 @@
+"""
+Change-driven status publishing for the Rosec scanner
+This module handles:
+- Diffing the device status against what was last pushed to Firebase
+- Pushing only the changed fields as soon as they change
+- Sending a small heartbeat when nothing has changed for a while
+"""
+
+import copy
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL = 1.0        # Seconds between status checks
+HEARTBEAT_INTERVAL = 30.0   # Longest silence before a heartbeat is sent
+RETRY_INTERVAL = 5.0        # Wait after a failed push
+
+def diff_status(current, previous, tolerances=None, path=()):
+    """Nested dict of the fields in `current` that differ from `previous`.
+
+    `tolerances` maps a field path (tuple of keys) to the smallest numeric
+    change worth reporting for it.
+    """
+    tolerances = tolerances or {}
+    changes = {}
+    for key, value in current.items():
+        field = path + (key,)
+        old = previous.get(key) if isinstance(previous, dict) else None
+        if isinstance(value, dict) and isinstance(old, dict):
+            nested = diff_status(value, old, tolerances, field)
+            if nested:
+                changes[key] = nested
+        elif field in tolerances and isinstance(value, (int, float)) and isinstance(old, (int, float)):
+            if abs(value - old) >= tolerances[field]:
+                changes[key] = value
+        elif value != old or (isinstance(previous, dict) and key not in previous):
+            changes[key] = value
+    return changes
+
+def merge_status(base, changes):
+    """Copy of `base` with the nested `changes` applied"""
+    merged = dict(base)
+    for key, value in changes.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_status(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+class StatusPublisher:
+    """Publishes `collect()` through `send(fields, full)` whenever it changes.
+
+    The first push, and the first after a failure, sends the whole status
+    (`full=True`). After that only changed fields are sent; numeric fields
+    listed in `tolerances` are only pushed early when they move by at least
+    that much, and otherwise ride along with the next heartbeat. With
+    `partial=False` every push, heartbeats included, sends the whole status
+    for receivers that replace what they stored. `collect` must be cheap,
+    since it runs every CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self, collect, send, tolerances=None,
+                 check_interval=CHECK_INTERVAL, heartbeat_interval=HEARTBEAT_INTERVAL, partial=True):
+        self.collect = collect
+        self.send = send
+        self.tolerances = tolerances or {}
+        self.partial = partial
+        self.check_interval = check_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.pushes = 0
+        self.heartbeats = 0
+        self.failures = 0
+        self._published = None
+        self._last_push = 0.0
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start publishing on a background thread"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='status-publisher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def notify(self):
+        """Check the status now instead of at the next interval"""
+        self._wake.set()
+
+    def stats(self):
+        return {'pushes': self.pushes, 'heartbeats': self.heartbeats, 'failures': self.failures}
+
+    def publish_once(self):
+        """Push whatever changed since the last push, or a heartbeat when due. Returns True on success"""
+        # A private copy, so later in-place changes to the live status still show up in the diff
+        status = copy.deepcopy(self.collect())
+        now = time.monotonic()
+
+        if self._published is None:
+            fields, full = status, True
+        else:
+            full = False
+            fields = diff_status(status, self._published, self.tolerances)
+            if not fields:
+                if now - self._last_push < self.heartbeat_interval:
+                    return True
+                # The heartbeat also carries small drifts held back by the tolerances
+                fields = diff_status(status, self._published)
+        changed = bool(fields) or full
+        if not self.partial:
+            fields, full = status, True
+
+        if not self.send(fields, full):
+            self._published = None
+            self.failures += 1
+            return False
+
+        self._published = merge_status(self._published or {}, fields)
+        self._last_push = now
+        if changed:
+            self.pushes += 1
+        else:
+            self.heartbeats += 1
+        return True
+
+    def _run(self):
+        while self._running:
+            try:
+                delay = self.check_interval if self.publish_once() else RETRY_INTERVAL
+            except Exception as e:
+                logger.warning(f"Firebase status update error: {e}")
+                self._published = None
+                self.failures += 1
+                delay = RETRY_INTERVAL
+            self._wake.wait(delay)
+            self._wake.clear()
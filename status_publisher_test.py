@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Status Publisher Test Suite for the Rosec scanner
+Checks the status diffing and what StatusPublisher pushes: the first full
+status, changed fields only, tolerances, heartbeats and recovery after a
+failed push
+"""
+
+import sys
+
+from status_publisher import StatusPublisher, diff_status, merge_status
+
+TOLERANCES = {
+    ('systemInfo', 'cpuUsage'): 20.0,
+    ('scanCount',): float('inf')
+}
+
+class StatusPublisherTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def run_test(self, name, test_func):
+        """Run a single test"""
+        self.tests_run += 1
+        print(f"\n🔍 Testing {name}...")
+
+        try:
+            success = test_func()
+            if success:
+                self.tests_passed += 1
+                print(f"✅ Passed - {name}")
+            else:
+                print(f"❌ Failed - {name}")
+            return success
+        except Exception as e:
+            print(f"❌ Failed - {name}: {str(e)}")
+            return False
+
+    def make_status(self):
+        return {
+            'online': True,
+            'scannerReady': True,
+            'currentSession': None,
+            'scanCount': 0,
+            'systemInfo': {'cpuUsage': 10.0, 'memoryUsage': 40.0}
+        }
+
+    def make_publisher(self, status, heartbeat_interval=3600.0, partial=True, fail=None):
+        """A publisher of `status` that records its pushes; `fail()` returning True fails a push"""
+        pushes = []
+
+        def send(fields, full):
+            if fail is not None and fail():
+                return False
+            pushes.append((fields, full))
+            return True
+
+        publisher = StatusPublisher(lambda: status, send, TOLERANCES,
+                                    heartbeat_interval=heartbeat_interval, partial=partial)
+        return publisher, pushes
+
+    def test_diff_status(self):
+        """Test that only changed nested fields are diffed"""
+        previous = self.make_status()
+        current = self.make_status()
+        current['scannerReady'] = False
+        current['systemInfo']['memoryUsage'] = 41.0
+        changes = diff_status(current, previous)
+        print(f"Changes: {changes}")
+        return changes == {'scannerReady': False, 'systemInfo': {'memoryUsage': 41.0}}
+
+    def test_diff_tolerances(self):
+        """Test that changes within a field's tolerance are held back"""
+        previous = self.make_status()
+        current = self.make_status()
+        current['systemInfo']['cpuUsage'] = 25.0
+        current['scanCount'] = 40
+        if diff_status(current, previous, TOLERANCES):
+            return False
+        current['systemInfo']['cpuUsage'] = 35.0
+        return diff_status(current, previous, TOLERANCES) == {'systemInfo': {'cpuUsage': 35.0}}
+
+    def test_merge_status(self):
+        """Test that merging a diff into the old status gives the new status"""
+        previous = self.make_status()
+        current = self.make_status()
+        current['currentSession'] = {'id': 'session', 'scan_count': 0}
+        current['systemInfo']['memoryUsage'] = 55.0
+        return merge_status(previous, diff_status(current, previous)) == current
+
+    def test_changed_fields_pushed(self):
+        """Test that the first push is full and later ones carry only the changes"""
+        status = self.make_status()
+        publisher, pushes = self.make_publisher(status)
+        publisher.publish_once()
+        publisher.publish_once()
+        status['currentSession'] = {'id': 'session'}
+        publisher.publish_once()
+        print(f"Pushes: {pushes}")
+        return pushes == [(self.make_status(), True), ({'currentSession': {'id': 'session'}}, False)]
+
+    def test_counters_ride_heartbeat(self):
+        """Test that held-back changes are only sent with the heartbeat"""
+        status = self.make_status()
+        publisher, pushes = self.make_publisher(status)
+        publisher.publish_once()
+        for count in range(1, 51):
+            status['scanCount'] = count
+            publisher.publish_once()
+        if len(pushes) != 1:
+            print(f"Pushed per scan: {pushes[1:]}")
+            return False
+        publisher.heartbeat_interval = 0.0
+        publisher.publish_once()
+        print(f"Heartbeat: {pushes[-1]}")
+        return pushes[-1] == ({'scanCount': 50}, False)
+
+    def test_full_documents(self):
+        """Test that partial=False pushes the whole status, heartbeats included"""
+        status = self.make_status()
+        publisher, pushes = self.make_publisher(status, heartbeat_interval=0.0, partial=False)
+        publisher.publish_once()
+        status['scannerReady'] = False
+        publisher.publish_once()
+        publisher.publish_once()
+        return (len(pushes) == 3 and all(full for _, full in pushes)
+                and pushes[0][0] == self.make_status() and pushes[1][0] == pushes[2][0] == status)
+
+    def test_failure_resends_full(self):
+        """Test that the push after a failure sends the whole status again"""
+        status = self.make_status()
+        failing = [False]
+        publisher, pushes = self.make_publisher(status, fail=lambda: failing[0])
+        publisher.publish_once()
+        failing[0] = True
+        status['scannerReady'] = False
+        if publisher.publish_once():
+            return False
+        failing[0] = False
+        publisher.publish_once()
+        print(f"Last push: {pushes[-1]}, stats: {publisher.stats()}")
+        return pushes[-1] == (status, True) and publisher.stats()['failures'] == 1
+
+def main():
+    """Run all status publisher tests"""
+    print("🚀 Starting Status Publisher Tests")
+    print("=" * 60)
+
+    tester = StatusPublisherTester()
+
+    tests = [
+        ("Status Diff", tester.test_diff_status),
+        ("Diff Tolerances", tester.test_diff_tolerances),
+        ("Merge Status", tester.test_merge_status),
+        ("Changed Fields Pushed", tester.test_changed_fields_pushed),
+        ("Counters Ride Heartbeat", tester.test_counters_ride_heartbeat),
+        ("Full Documents", tester.test_full_documents),
+        ("Failure Resends Full Status", tester.test_failure_resends_full)
+    ]
+
+    for test_name, test_func in tests:
+        tester.run_test(test_name, test_func)
+
+    # Print summary
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {tester.tests_passed}/{tester.tests_run} tests passed")
+
+    if tester.tests_passed == tester.tests_run:
+        print("🎉 All status publisher tests passed!")
+        return 0
+    else:
+        failed_tests = tester.tests_run - tester.tests_passed
+        print(f"⚠️  {failed_tests} test(s) failed. Check the issues above.")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+"""
+Durable outbound sync queue for the Rosec scanner
+This module handles:
+- Appending outgoing Firebase payloads and their raw images to a local SQLite database (WAL mode)
+- Draining the queue on a background sender thread in coalesced batches
+- Retrying failed items with exponential backoff, across restarts
+- Separate traffic classes (e.g. answer records and images) sharing one database,
+  with an optional bandwidth cap and send window per class
+"""
+
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+INITIAL_BACKOFF = 2.0       # Seconds before the first retry
+MAX_BACKOFF = 300.0         # Longest wait between retries
+
+DEFAULT_BATCH_SIZE = 1      # Most payloads sent in one batch
+DEFAULT_BATCH_BYTES = 8 * 1024 * 1024   # Most serialized payload bytes in one batch
+DEFAULT_BATCH_WAIT = 0.0    # Seconds a due payload may wait for others to join its batch
+
+class SyncQueue:
+    """Append-only SQLite outbox drained by a background sender.
+
+    Due payloads are grouped into batches that are flushed once they hold
+    `batch_size` payloads or `batch_bytes` bytes, or once the oldest has waited
+    `batch_wait` seconds. `send(batch)` gets a list of (queue id, payload,
+    image bytes or None) and returns the ids the server acknowledged; the
+    other payloads (or all of them when it raises) are retried on their own
+    schedule. Rows are only deleted once acknowledged, so nothing is lost on
+    a crash or reboot.
+
+    Each queue drains only rows of its own `kind`, so several queues can
+    share one database file. `bandwidth` (bytes per second) paces the sender
+    to that average rate, and `ready()` returning False holds sending back.
+    """
+
+    def __init__(self, path, send, batch_size=DEFAULT_BATCH_SIZE,
+                 batch_bytes=DEFAULT_BATCH_BYTES, batch_wait=DEFAULT_BATCH_WAIT,
+                 kind='results', bandwidth=None, ready=None):
+        self.path = path
+        self.send = send
+        self.batch_size = max(1, batch_size)
+        self.batch_bytes = batch_bytes
+        self.batch_wait = batch_wait
+        self.kind = kind
+        self.bandwidth = bandwidth
+        self.ready = ready
+        self.bytes_sent = 0
+        self.batches = 0
+        self.sent = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL,
+                last_error TEXT,
+                image BLOB,
+                kind TEXT NOT NULL DEFAULT 'results'
+            )
+        ''')
+        columns = [row[1] for row in self._db.execute('PRAGMA table_info(outbox)')]
+        if 'image' not in columns:
+            # Queues created before images were stored as raw bytes
+            self._db.execute('ALTER TABLE outbox ADD COLUMN image BLOB')
+        if 'kind' not in columns:
+            # Queues created before traffic classes existed only hold results
+            self._db.execute("ALTER TABLE outbox ADD COLUMN kind TEXT NOT NULL DEFAULT 'results'")
+        self._db.execute('DROP INDEX IF EXISTS outbox_due')
+        self._db.execute('CREATE INDEX IF NOT EXISTS outbox_kind_due ON outbox (kind, next_attempt, id)')
+
+    def enqueue(self, payload, image=None):
+        """Store a payload, and optionally its image bytes, for sending and return its queue id"""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                'INSERT INTO outbox (kind, payload, image, created_at, next_attempt) VALUES (?, ?, ?, ?, ?)',
+                (self.kind, json.dumps(payload), None if image is None else bytes(image), now, now))
+        self._wake.set()
+        return cursor.lastrowid
+
+    def depth(self):
+        """Number of payloads waiting to be sent"""
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM outbox WHERE kind = ?', (self.kind,)).fetchone()[0]
+
+    def stats(self):
+        """Queue depth, age of the oldest entry and send counters"""
+        with self._lock:
+            depth, oldest = self._db.execute('SELECT COUNT(*), MIN(created_at) FROM outbox WHERE kind = ?',
+                                             (self.kind,)).fetchone()
+        return {
+            'depth': depth,
+            'oldest_age': round(time.time() - oldest, 1) if oldest else 0.0,
+            'sent': self.sent,
+            'batches': self.batches,
+            'bytes_sent': self.bytes_sent,
+            'failures': self.failures
+        }
+
+    def notify(self):
+        """Re-check the queue now, e.g. when `ready()` may have become true"""
+        self._wake.set()
+
+    def start(self):
+        """Start the background sender"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f'sync-sender-{self.kind}', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background sender; queued payloads stay on disk"""
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _next_batch(self):
+        """Due rows for the next batch, or the time to wait before one is ready"""
+        now = time.time()
+        with self._lock:
+            first = self._db.execute('SELECT MIN(next_attempt) FROM outbox WHERE kind = ?', (self.kind,)).fetchone()[0]
+            if first is None:
+                return None, None
+            if first > now:
+                return None, first - now
+            rows = self._db.execute(
+                'SELECT id, payload, image, attempts, LENGTH(payload) + IFNULL(LENGTH(image), 0) FROM outbox '
+                'WHERE kind = ? AND next_attempt <= ? ORDER BY next_attempt, id LIMIT ?',
+                (self.kind, now, self.batch_size)).fetchall()
+
+        batch, size = [], 0
+        for row in rows:
+            if batch and size + row[4] > self.batch_bytes:
+                break
+            batch.append(row)
+            size += row[4]
+
+        # Hold a partial batch back until its oldest payload has waited long enough
+        full = len(batch) < len(rows) or len(batch) >= self.batch_size or size >= self.batch_bytes
+        remaining = first + self.batch_wait - now
+        if not full and remaining > 0:
+            return None, remaining
+        return batch, None
+
+    def _run(self):
+        while self._running:
+            if self.ready is not None and not self.ready():
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+
+            batch, delay = self._next_batch()
+            if batch is None:
+                # Sleep until a retry or a partial batch is due, or until something new is queued
+                self._wake.wait(delay)
+                self._wake.clear()
+                continue
+
+            started = time.monotonic()
+            try:
+                items = [(row_id, json.loads(payload), image) for row_id, payload, image, _, _ in batch]
+                acknowledged = set(self.send(items) or ())
+                error = 'Not acknowledged by server'
+            except Exception as e:
+                acknowledged, error = set(), str(e)
+
+            failed = [row for row in batch if row[0] not in acknowledged]
+            now = time.time()
+            with self._lock:
+                self._db.execute('BEGIN')
+                for row_id, _, _, attempts, _ in batch:
+                    if row_id in acknowledged:
+                        self._db.execute('DELETE FROM outbox WHERE id = ?', (row_id,))
+                    else:
+                        backoff = min(MAX_BACKOFF, INITIAL_BACKOFF * 2 ** attempts) * random.uniform(0.8, 1.2)
+                        self._db.execute(
+                            'UPDATE outbox SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?',
+                            (attempts + 1, now + backoff, error, row_id))
+                self._db.execute('COMMIT')
+
+            size = sum(row[4] for row in batch)
+            self.batches += 1
+            self.sent += len(batch) - len(failed)
+            self.bytes_sent += size
+            self.failures += len(failed)
+            if failed:
+                logger.warning(f"Firebase sync failed for {len(failed)} of {len(batch)} {self.kind}, retrying: {error}")
+
+            if self.bandwidth:
+                # Pace the sender so it averages no more than `bandwidth` bytes per second
+                pause = size / float(self.bandwidth) - (time.monotonic() - started)
+                if pause > 0:
+                    time.sleep(pause)
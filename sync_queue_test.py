@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Sync Queue Test Suite for the Rosec scanner
+Drives SyncQueue against a fake Firebase that acknowledges only part of
+each batch, and checks that every payload is delivered exactly once
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import sync_queue
+from sync_queue import SyncQueue
+
+# Retry within the test instead of after the production backoff
+sync_queue.INITIAL_BACKOFF = 0.05
+
+class FakeFirebase:
+    """Records batches and acknowledges the ids `acknowledge(batch)` picks"""
+
+    def __init__(self, acknowledge=None):
+        self.acknowledge = acknowledge or (lambda batch: [item_id for item_id, _, _ in batch])
+        self.batches = []
+        self.delivered = []
+        self.lock = threading.Lock()
+
+    def send(self, batch):
+        with self.lock:
+            self.batches.append(batch)
+            acknowledged = list(self.acknowledge(batch))
+            self.delivered.extend(payload['n'] for item_id, payload, _ in batch if item_id in acknowledged)
+        return acknowledged
+
+class SyncQueueTester:
+    def __init__(self):
+        self.directory = tempfile.mkdtemp(prefix='sync_queue_test_')
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def run_test(self, name, test_func):
+        """Run a single test"""
+        self.tests_run += 1
+        print(f"\n🔍 Testing {name}...")
+
+        try:
+            success = test_func()
+            if success:
+                self.tests_passed += 1
+                print(f"✅ Passed - {name}")
+            else:
+                print(f"❌ Failed - {name}")
+            return success
+        except Exception as e:
+            print(f"❌ Failed - {name}: {str(e)}")
+            return False
+
+    def queue_path(self, name):
+        return os.path.join(self.directory, f'{name}.db')
+
+    def wait_until(self, condition, timeout=5.0):
+        """Poll `condition` until it holds; False on timeout"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if condition():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_batching(self):
+        """Test that queued payloads go out in batches of batch_size"""
+        server = FakeFirebase()
+        queue = SyncQueue(self.queue_path('batching'), server.send, batch_size=4)
+        for n in range(10):
+            queue.enqueue({'n': n})
+        queue.start()
+        try:
+            if not self.wait_until(lambda: queue.depth() == 0):
+                print(f"Still queued: {queue.depth()}")
+                return False
+        finally:
+            queue.stop()
+        sizes = [len(batch) for batch in server.batches]
+        print(f"Batch sizes: {sizes}")
+        return sizes == [4, 4, 2] and sorted(server.delivered) == list(range(10))
+
+    def test_partial_acknowledgement(self):
+        """Test that unacknowledged items of a batch are retried and delivered once"""
+        attempts = {}
+
+        def acknowledge(batch):
+            # Every odd payload is refused the first time it is sent
+            acknowledged = []
+            for item_id, payload, _ in batch:
+                attempts[payload['n']] = attempts.get(payload['n'], 0) + 1
+                if payload['n'] % 2 == 0 or attempts[payload['n']] > 1:
+                    acknowledged.append(item_id)
+            return acknowledged
+
+        server = FakeFirebase(acknowledge)
+        queue = SyncQueue(self.queue_path('partial'), server.send, batch_size=10)
+        for n in range(6):
+            queue.enqueue({'n': n})
+        queue.start()
+        try:
+            if not self.wait_until(lambda: queue.depth() == 0):
+                print(f"Still queued: {queue.depth()}")
+                return False
+        finally:
+            queue.stop()
+        stats = queue.stats()
+        print(f"Attempts: {attempts}, stats: {stats}")
+        return (sorted(server.delivered) == list(range(6))
+                and attempts == {0: 1, 1: 2, 2: 1, 3: 2, 4: 1, 5: 2}
+                and stats['sent'] == 6 and stats['failures'] == 3)
+
+    def test_send_error_retried(self):
+        """Test that a batch whose send raises is kept and retried"""
+        calls = []
+
+        def send(batch):
+            calls.append(len(batch))
+            if len(calls) == 1:
+                raise ConnectionError("Firebase unreachable")
+            return [item_id for item_id, _, _ in batch]
+
+        queue = SyncQueue(self.queue_path('error'), send, batch_size=5)
+        for n in range(3):
+            queue.enqueue({'n': n})
+        queue.start()
+        try:
+            delivered = self.wait_until(lambda: queue.depth() == 0)
+        finally:
+            queue.stop()
+        # Each payload's retry is jittered, so they may come back in separate batches
+        print(f"Batches sent: {calls}")
+        return delivered and calls[0] == 3 and sum(calls[1:]) == 3
+
+    def test_survives_restart(self):
+        """Test that payloads queued before a restart are sent by the next queue on the same file"""
+        path = self.queue_path('restart')
+        first = SyncQueue(path, FakeFirebase().send, ready=lambda: False)
+        first.start()
+        image_id = first.enqueue({'n': 1}, b'\xff\xd8jpeg')
+        first.enqueue({'n': 2})
+        first.stop()
+
+        images = {}
+        server = FakeFirebase()
+
+        def send(batch):
+            images.update({item_id: image for item_id, _, image in batch})
+            return server.send(batch)
+
+        second = SyncQueue(path, send, batch_size=10)
+        if second.depth() != 2:
+            print(f"Depth after restart: {second.depth()}")
+            return False
+        second.start()
+        try:
+            delivered = self.wait_until(lambda: second.depth() == 0)
+        finally:
+            second.stop()
+        return delivered and sorted(server.delivered) == [1, 2] and images.get(image_id) == b'\xff\xd8jpeg'
+
+    def test_kinds_share_file(self):
+        """Test that queues of different kinds on one file only drain their own rows"""
+        path = self.queue_path('kinds')
+        results_server, image_server = FakeFirebase(), FakeFirebase()
+        results = SyncQueue(path, results_server.send, batch_size=10)
+        images = SyncQueue(path, image_server.send, kind='image', ready=lambda: False)
+        results.enqueue({'n': 1})
+        images.enqueue({'n': 2}, b'image')
+        results.start()
+        images.start()
+        try:
+            if not self.wait_until(lambda: results.depth() == 0):
+                return False
+            time.sleep(0.2)
+            held = images.depth() == 1 and image_server.delivered == []
+        finally:
+            results.stop()
+            images.stop()
+        return held and results_server.delivered == [1]
+
+def main():
+    """Run all sync queue tests"""
+    print("🚀 Starting Sync Queue Tests")
+    print("=" * 60)
+
+    tester = SyncQueueTester()
+
+    tests = [
+        ("Batching", tester.test_batching),
+        ("Partial Acknowledgement", tester.test_partial_acknowledgement),
+        ("Send Error Retried", tester.test_send_error_retried),
+        ("Survives Restart", tester.test_survives_restart),
+        ("Kinds Share One File", tester.test_kinds_share_file)
+    ]
+
+    for test_name, test_func in tests:
+        tester.run_test(test_name, test_func)
+    shutil.rmtree(tester.directory, ignore_errors=True)
+
+    # Print summary
+    print("\n" + "=" * 60)
+    print(f"📊 Test Results: {tester.tests_passed}/{tester.tests_run} tests passed")
+
+    if tester.tests_passed == tester.tests_run:
+        print("🎉 All sync queue tests passed!")
+        return 0
+    else:
+        failed_tests = tester.tests_run - tester.tests_passed
+        print(f"⚠️  {failed_tests} test(s) failed. Check the issues above.")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
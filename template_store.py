@@ -0,0 +1,214 @@
+"""
+Exam template store for the Rosec scanner
+This module handles:
+- Fetching exam templates from an HTTP template source or straight from Firestore
+- Keeping them in an on-disk cache that survives restarts and network outages
+- Revalidating cached templates with ETag / version checks instead of refetching
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import firebase_client
+import http_client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE = 300.0     # Seconds before a cached template is revalidated
+FIRESTORE_COLLECTION = 'exams'
+
+def template_etag(exam_template):
+    """Content hash of a template, used when the source sends no ETag of its own"""
+    encoded = json.dumps(exam_template, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha1(encoded).hexdigest()
+
+class TemplateStore:
+    """Exam templates by examId, cached on disk.
+
+    Templates come from `source_url` (a server with GET /api/exam/<exam_id>,
+    such as mock_pi_api.py) when set, otherwise from Firestore through the
+    service account key at `firestore_key`. A cached template is served as
+    is for `max_age` seconds; after that it is still served straight away
+    while a background thread revalidates it. When the source cannot be
+    reached the cached copy keeps being served, however old. `cache_dir` is
+    created when the first template is saved.
+    """
+
+    def __init__(self, cache_dir, source_url=None, firestore_key=None, max_age=DEFAULT_MAX_AGE):
+        self.cache_dir = cache_dir
+        self.source_url = source_url.rstrip('/') if source_url else None
+        self.firestore_key = firestore_key
+        self.max_age = max_age
+        self.fetches = 0
+        self.not_modified = 0
+        self.offline_hits = 0
+        self._entries = {}
+        self._revalidating = set()
+        self._fetch_locks = {}
+        # Guards the entries and counters only; the source is never called under it
+        self._lock = threading.Lock()
+
+    def _path(self, exam_id):
+        safe = re.sub(r'[^A-Za-z0-9_.-]', '_', str(exam_id))
+        return os.path.join(self.cache_dir, f'{safe}.json')
+
+    def _load(self, exam_id):
+        entry = self._entries.get(exam_id)
+        if entry is None:
+            try:
+                with open(self._path(exam_id), 'r') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                return None
+            # Entries read from disk are revalidated before first use
+            entry['checked_at'] = 0.0
+            self._entries[exam_id] = entry
+        return entry
+
+    def _save(self, exam_id, template, etag):
+        entry = {'template': template, 'etag': etag, 'checked_at': time.time()}
+        path = self._path(exam_id)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'template': template, 'etag': etag}, f)
+        os.replace(path + '.tmp', path)
+        self._entries[exam_id] = entry
+        return entry
+
+    def get(self, exam_id, refresh=False):
+        """The template for `exam_id`, or None if it is neither cached nor fetchable.
+
+        Only a template that is not cached yet, or a `refresh`, waits on the source.
+        """
+        with self._lock:
+            entry = self._load(exam_id)
+            if entry is not None and not refresh:
+                stale = time.time() - entry['checked_at'] >= self.max_age
+                if stale and (self.source_url or self.firestore_key) and exam_id not in self._revalidating:
+                    self._revalidating.add(exam_id)
+                    threading.Thread(target=self._revalidate_in_background, args=(exam_id,),
+                                     daemon=True).start()
+                return entry['template']
+            if entry is not None and not (self.source_url or self.firestore_key):
+                # Without a source the cache is all there is
+                return entry['template']
+            fetch_lock = self._fetch_locks.setdefault(exam_id, threading.Lock())
+
+        with fetch_lock:
+            if not refresh:
+                # Another request may have fetched it while this one waited
+                with self._lock:
+                    entry = self._load(exam_id)
+                if entry is not None:
+                    return entry['template']
+            return self._revalidate(exam_id)
+
+    def _revalidate_in_background(self, exam_id):
+        try:
+            with self._lock:
+                fetch_lock = self._fetch_locks.setdefault(exam_id, threading.Lock())
+            with fetch_lock:
+                self._revalidate(exam_id)
+        except Exception as e:
+            logger.warning(f"Revalidating exam template {exam_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._revalidating.discard(exam_id)
+
+    def _revalidate(self, exam_id):
+        """Check `exam_id` against the source and update the cache. Returns the template or None"""
+        with self._lock:
+            entry = self._load(exam_id)
+        try:
+            fetched = self._fetch(exam_id, entry['etag'] if entry else None)
+        except Exception as e:
+            if entry is None:
+                logger.warning(f"Exam template {exam_id} unavailable: {e}")
+                return None
+            logger.warning(f"Serving cached exam template {exam_id}, source unreachable: {e}")
+            with self._lock:
+                self.offline_hits += 1
+                # Do not try the source again for every scan until max_age has passed again
+                entry['checked_at'] = time.time()
+            return entry['template']
+
+        with self._lock:
+            if fetched is None:
+                # Not modified since the cached copy
+                self.not_modified += 1
+                entry['checked_at'] = time.time()
+                return entry['template']
+
+            template, etag = fetched
+            if template is None:
+                return None
+            self.fetches += 1
+            return self._save(exam_id, template, etag)['template']
+
+    def prefetch(self, exam_ids):
+        """Make sure the templates for `exam_ids` are cached. Returns {exam_id: available}"""
+        return {exam_id: self.get(exam_id) is not None for exam_id in exam_ids if exam_id}
+
+    def expire(self, exam_id=None):
+        """Revalidate the template for `exam_id` (or every template) on next use"""
+        with self._lock:
+            for cached_id, entry in self._entries.items():
+                if exam_id is None or cached_id == exam_id:
+                    entry['checked_at'] = 0.0
+
+    def stats(self):
+        try:
+            cached = len([name for name in os.listdir(self.cache_dir) if name.endswith('.json')])
+        except FileNotFoundError:
+            cached = 0
+        return {
+            'cached': cached,
+            'fetches': self.fetches,
+            'not_modified': self.not_modified,
+            'offline_hits': self.offline_hits,
+            'source': 'http' if self.source_url else 'firestore' if self.firestore_key else None
+        }
+
+    def _fetch(self, exam_id, etag):
+        """(template, etag) from the source, None if unchanged; template is None if the exam is unknown"""
+        if self.source_url:
+            return self._fetch_http(exam_id, etag)
+        if self.firestore_key:
+            return self._fetch_firestore(exam_id, etag)
+        raise RuntimeError('No template source configured')
+
+    def _fetch_http(self, exam_id, etag):
+        headers = {'If-None-Match': f'"{etag}"'} if etag else {}
+        response = http_client.get(f'{self.source_url}/api/exam/{exam_id}', headers=headers, timeout=(3.05, 10))
+        if response.status_code == 304:
+            return None
+        if response.status_code == 404:
+            return None, None
+        response.raise_for_status()
+
+        template = response.json().get('template')
+        if template is None:
+            return None, None
+        template.setdefault('examId', exam_id)
+        new_etag = response.headers.get('ETag', '')
+        if new_etag.startswith('W/'):
+            new_etag = new_etag[2:]
+        return template, new_etag.strip('"') or template_etag(template)
+
+    def _fetch_firestore(self, exam_id, etag):
+        # firebase_admin is only imported when templates come straight from Firestore
+        snapshot = firebase_client.firestore_client(self.firestore_key).collection(FIRESTORE_COLLECTION).document(exam_id).get()
+        if not snapshot.exists:
+            return None, None
+        version = str(snapshot.update_time)
+        if version == etag:
+            return None
+
+        template = json.loads(json.dumps(snapshot.to_dict(), default=str))
+        template.setdefault('examId', exam_id)
+        return template, version